@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+
+# Measures a batch of metric requests that share their channels and
+# time-window, as sent by a dashboard asking for several features of the
+# same data. Extracting the window for every request (as handle_metric did)
+# is compared with BaseNode.calculate_metrics, which extracts each distinct
+# window once, with and without a pool of threads.
+#
+# Usage: python batch_metric_benchmark.py [n_samples] [n_requests] [n_runs]
+
+import sys
+import time
+import numpy as np
+from midas.node import BaseNode
+
+CHANNELS = ['S1', 'S2', 'S3', 'S4']
+METRICS = [np.mean, np.std, np.max, np.min, np.median]
+
+
+def make_metric(fn):
+    def metric(x):
+        return [float(fn(d)) for d in x['data']]
+    metric.__name__ = fn.__name__
+    return metric
+
+
+def per_request(node, requests):
+    """ Extract the window of every request separately. """
+    snapshot = node.snapshot_data(CHANNELS, node.get_time_span(requests))
+    results = []
+    for request in requests:
+        data, times = node.unpack_snapshot(snapshot, request['channels'],
+                                           list(request['time_window']))
+        results.append(node.metric_pointers[request['type']](
+            {'data': data, 'time': times}))
+    return results
+
+
+def batched(node, requests):
+    results = {}
+    node.calculate_metrics(requests, range(len(requests)),
+                           [None] * len(requests), results)
+    return [results[i] for i in range(len(requests))]
+
+
+def benchmark(fn, node, requests, n_runs):
+    t = time.time()
+    for _ in range(n_runs):
+        fn(node, requests)
+    return 1e3 * (time.time() - t) / n_runs
+
+
+if __name__ == '__main__':
+    n_samples = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    n_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    n_runs = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    samples = np.random.randn(len(CHANNELS), n_samples)
+    results = {}
+    for name, threads in [('per request', 1), ('batched', 1),
+                          ('batched, 4 threads', 4)]:
+        node = BaseNode(primary_node=False,
+                        secondary_node=True,
+                        secondary_n_channels=len(CHANNELS),
+                        secondary_buffer_size=n_samples,
+                        secondary_channel_names=CHANNELS,
+                        metric_cache_size=0,
+                        metric_threads=threads)
+        for ch in range(len(CHANNELS)):
+            node.push_chunk_secondary(ch, list(range(n_samples)),
+                                      samples[ch])
+        node.metric_functions.extend(make_metric(fn) for fn in METRICS)
+        node.generate_metric_lists()
+
+        requests = [{'type': METRICS[i % len(METRICS)].__name__,
+                     'channels': CHANNELS,
+                     'time_window': [n_samples / 2, n_samples / 2]}
+                    for i in range(n_requests)]
+
+        fn = per_request if name == 'per request' else batched
+        results[name] = fn(node, requests)
+        print('{:>18}: {:8.2f} ms/batch'.format(
+            name, benchmark(fn, node, requests, n_runs)))
+
+        for buf in node.secondary_buffers:
+            buf.unlink()
+
+    assert results['batched'] == results['per request']
+    assert results['batched, 4 threads'] == results['per request']
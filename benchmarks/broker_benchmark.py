@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+# Measures the request rate a node can serve with the LRU broker and the
+# proxy broker. Client processes send ping requests to the node as fast as
+# possible and the total number of completed requests per second is reported.
+#
+# Usage: python broker_benchmark.py [n_clients] [n_responders] [duration]
+
+import sys
+import time
+import multiprocessing as mp
+import zmq
+from midas.node import BaseNode
+from midas import utilities as mu
+
+
+def client(url, duration, result):
+    """ Send ping requests to url for duration seconds. """
+    context = zmq.Context()
+    socket = context.socket(zmq.REQ)
+    socket.connect(url)
+    n = 0
+    t_end = time.time() + duration
+    while time.time() < t_end:
+        mu.midas_send(socket, 'ping', 'ping')
+        socket.recv()
+        n += 1
+    with result.get_lock():
+        result.value += n
+    socket.close()
+    context.term()
+
+
+def benchmark(broker_mode, n_clients, n_responders, duration):
+    node = BaseNode(node_name='benchmark_' + broker_mode,
+                    primary_node=False,
+                    ip='127.0.0.1',
+                    port_frontend=5301,
+                    port_backend=5302,
+                    n_responders=n_responders,
+                    broker_mode=broker_mode)
+    node.start()
+
+    result = mp.Value('i', 0)
+    clients = [mp.Process(target=client, args=(node.url_frontend, duration, result))
+               for _ in range(n_clients)]
+    for p in clients:
+        p.start()
+    for p in clients:
+        p.join()
+
+    node.stop()
+    return result.value / duration
+
+
+if __name__ == '__main__':
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_responders = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 5
+
+    rates = {}
+    for broker_mode in ['lru', 'proxy']:
+        rates[broker_mode] = benchmark(broker_mode, n_clients, n_responders, duration)
+
+    print('{} clients, {} responders'.format(n_clients, n_responders))
+    for broker_mode, rate in rates.items():
+        print('{:>5} broker: {:8.0f} requests/s'.format(broker_mode, rate))
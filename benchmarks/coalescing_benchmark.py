@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+
+# Measures request coalescing in a node. Clients send the same expensive
+# metric request (Welch's power spectral density) at the same moment, and
+# the time until all of them have their reply is reported. Without
+# coalescing every responder calculates the metric; with it the first
+# responder calculates it and the others wait for its result.
+#
+# Usage: python coalescing_benchmark.py [n_clients] [n_samples]
+
+import sys
+import time
+import threading
+from welch_node import WELCH_REQUEST, start_node, stop_node
+
+
+def run(n_clients, n_samples, coalesce):
+    node, pool = start_node('benchmark_coalescing', 5331, n_samples,
+                            pool_size=n_clients,
+                            n_responders=n_clients,
+                            metric_coalesce=coalesce)
+
+    # connect all sockets before the clients start
+    sockets = [pool.acquire() for _ in range(n_clients)]
+    for socket in sockets:
+        pool.release(socket)
+
+    barrier = threading.Barrier(n_clients + 1)
+
+    def client():
+        barrier.wait()
+        pool.request('metric', WELCH_REQUEST)
+
+    threads = [threading.Thread(target=client) for _ in range(n_clients)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    t = time.time()
+    for thread in threads:
+        thread.join()
+    duration = time.time() - t
+
+    return duration, stop_node(node, pool)
+
+if __name__ == '__main__':
+    n_clients = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    n_samples = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+
+    print('{} clients, {} samples'.format(n_clients, n_samples))
+    for name, coalesce in [('separate', False), ('coalesced', True)]:
+        duration, stats = run(n_clients, n_samples, coalesce)
+        print('{:>9}: {:6.3f} s {}'.format(name, duration, stats))
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+# Measures how long the dispatcher takes to discover the properties of many
+# nodes. The nodes are simulated by threads that reply to the property
+# commands after a delay, which stands for the network round trip. The
+# serial discovery (four requests per node, one node at a time) is compared
+# with Dispatcher.discover_node_properties (one describe request per node,
+# all nodes at once).
+#
+# Usage: python discovery_benchmark.py [n_nodes] [delay_ms]
+
+import sys
+import json
+import time
+import threading
+import zmq
+from midas.dispatcher import Dispatcher
+from midas import utilities as mu
+
+PORT = 7200
+
+
+def fake_node(context, url, delay):
+    """ Reply to the property commands of the dispatcher after a delay. """
+    description = {'metrics': {'metric_a': ''},
+                   'data': {'Ch1': ''},
+                   'topics': {},
+                   'publisher': url}
+    replies = {'get_metric_list': description['metrics'],
+               'get_data_list': description['data'],
+               'get_topic_list': description['topics'],
+               'get_publisher': description['publisher'],
+               'describe': description}
+
+    socket = context.socket(zmq.ROUTER)
+    socket.bind(url)
+    while True:
+        address, _, command = mu.midas_recv(socket)
+        threading.Timer(delay, mu.midas_send,
+                        args=(socket, 'reply', json.dumps(replies[command]),
+                              address)).start()
+
+
+def serial_discovery(context, node_addresses):
+    """ Discovery as it was done before the describe command. """
+    for node in node_addresses:
+        socket = context.socket(zmq.REQ)
+        socket.connect(node_addresses[node]['address'])
+        for command in ['get_metric_list', 'get_data_list',
+                        'get_topic_list', 'get_publisher']:
+            mu.midas_send(socket, 'command', command)
+            json.loads(socket.recv_string())
+        socket.close()
+
+
+if __name__ == '__main__':
+    n_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    delay = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.005
+
+    context = zmq.Context()
+    node_addresses = {}
+    for i in range(n_nodes):
+        url = 'tcp://127.0.0.1:{}'.format(PORT + i)
+        node_addresses['node_{}'.format(i)] = {'address': url}
+        threading.Thread(target=fake_node, args=(context, url, delay),
+                         daemon=True).start()
+
+    dispatcher = Dispatcher(ip='127.0.0.1')
+    dispatcher.node_addresses = node_addresses
+
+    t = time.time()
+    serial_discovery(context, node_addresses)
+    t_serial = time.time() - t
+
+    t = time.time()
+    dispatcher.discover_node_properties()
+    t_parallel = time.time() - t
+    assert len(dispatcher.node_metrics) == n_nodes
+
+    print('{} nodes, {:.0f} ms round trip'.format(n_nodes, 1000 * delay))
+    print('  serial: {:8.3f} s'.format(t_serial))
+    print('describe: {:8.3f} s'.format(t_parallel))
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+
+# Compares the two ways the dispatcher can talk to a node: a fresh REQ socket
+# for every request (connect, send, receive, close) and a persistent
+# SocketPool shared by the threads. Threads send ping requests to a node as
+# fast as possible and the request rate and mean latency are reported.
+#
+# Usage: python dispatcher_pool_benchmark.py [n_threads] [duration]
+
+import sys
+import time
+import threading
+import zmq
+from midas.node import BaseNode
+from midas import utilities as mu
+
+
+def fresh_socket_request(context, url):
+    """ Send one request over a new socket, as the dispatcher used to. """
+    socket = context.socket(zmq.REQ)
+    socket.setsockopt(zmq.LINGER, 0)
+    socket.connect(url)
+    mu.midas_send(socket, 'ping', 'ping')
+    socket.recv()
+    socket.close()
+
+
+def worker(request, duration, latencies):
+    t_end = time.time() + duration
+    while time.time() < t_end:
+        t = time.perf_counter()
+        request()
+        latencies.append(time.perf_counter() - t)
+
+
+def benchmark(request, n_threads, duration):
+    latencies = []
+    threads = [threading.Thread(target=worker,
+                                args=(request, duration, latencies))
+               for _ in range(n_threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return len(latencies) / duration, 1e3 * sum(latencies) / len(latencies)
+
+
+if __name__ == '__main__':
+    n_threads = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    node = BaseNode(node_name='benchmark_pool',
+                    primary_node=False,
+                    ip='127.0.0.1',
+                    port_frontend=5311,
+                    port_backend=5312,
+                    n_responders=n_threads)
+    node.start()
+    time.sleep(1)
+
+    context = zmq.Context()
+    pool = mu.SocketPool(context, node.url_frontend, n_threads)
+
+    results = {}
+    results['fresh socket'] = benchmark(
+        lambda: fresh_socket_request(context, node.url_frontend),
+        n_threads, duration)
+    results['socket pool'] = benchmark(
+        lambda: pool.request('ping', 'ping'), n_threads, duration)
+
+    pool.close()
+    node.stop()
+
+    print('{} threads'.format(n_threads))
+    for name, (rate, latency) in results.items():
+        print('{:>12}: {:8.0f} requests/s, {:6.3f} ms/request'.format(
+            name, rate, latency))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+# Compares requesting the mean and variance of a primary node's channels
+# calculated from the whole buffer on each request with an incremental
+# metric updated by the receiver as samples arrive. The node receives a
+# stream of random data until its buffer is full, after which the mean time
+# per request is reported.
+#
+# Usage: python incremental_metric_benchmark.py [n_channels] [sampling_rate]
+#                                               [buffer_size_s] [n_requests]
+
+import sys
+import json
+import time
+import multiprocessing as mp
+import numpy as np
+import pylsl as lsl
+import zmq
+from midas.node import BaseNode
+from midas import utilities as mu
+
+STREAM_NAME = 'MidasBenchmarkIncremental'
+
+
+class RunningStats(mu.IncrementalMetric):
+    """ Mean and variance of each channel. """
+
+    def init(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, data, times):
+        data = np.asarray(data, dtype=np.float64)
+        n = len(data)
+        mean = np.mean(data, axis=0)
+        m2 = np.sum((data - mean) ** 2, axis=0)
+        delta = mean - self.mean
+        total = self.n + n
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * n / total
+        self.n = total
+
+    def value(self):
+        if self.n < 2:
+            return None
+        return {'mean': np.atleast_1d(self.mean).tolist(),
+                'variance': np.atleast_1d(self.m2 / (self.n - 1)).tolist()}
+
+
+def window_stats(x):
+    """ Mean and variance of each channel. """
+    return {'mean': [float(np.mean(d)) for d in x['data']],
+            'variance': [float(np.var(d, ddof=1)) for d in x['data']]}
+
+
+def run_outlet(n_channels, fs, run_state):
+    """ Stream random data at fs Hz in blocks of 10 ms. """
+    info = lsl.StreamInfo(STREAM_NAME, 'EEG', n_channels, fs, 'float32',
+                          'midas-benchmark-incremental')
+    outlet = lsl.StreamOutlet(info)
+    block = max(1, int(fs / 100))
+    t_next = time.time()
+    while run_state.value:
+        outlet.push_chunk(np.random.randn(block, n_channels).astype(np.float32))
+        t_next += block / fs
+        time.sleep(max(0.0, t_next - time.time()))
+
+
+def time_requests(pool, request, n_requests):
+    t = time.time()
+    for _ in range(n_requests):
+        pool.request('metric', request)
+    return 1e3 * (time.time() - t) / n_requests
+
+
+if __name__ == '__main__':
+    n_channels = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    fs = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    buffer_size_s = float(sys.argv[3]) if len(sys.argv) > 3 else 30
+    n_requests = int(sys.argv[4]) if len(sys.argv) > 4 else 100
+
+    run_state = mp.Value('i', 1)
+    outlet = mp.Process(target=run_outlet, args=(n_channels, fs, run_state))
+    outlet.start()
+
+    channel_names = ['Ch{}'.format(i) for i in range(n_channels)]
+    node = BaseNode(node_name='benchmark_incremental',
+                    ip='127.0.0.1',
+                    port_frontend=5341,
+                    port_backend=5342,
+                    lsl_stream_name=STREAM_NAME,
+                    primary_n_channels=n_channels,
+                    primary_channel_names=channel_names,
+                    primary_sampling_rate=fs,
+                    primary_buffer_size_s=buffer_size_s,
+                    primary_chunk_size=32,
+                    metric_cache_size=0)
+    node.metric_functions.append(window_stats)
+    node.incremental_metrics.append(RunningStats('running_stats'))
+    node.start()
+
+    # Fill the buffer
+    time.sleep(buffer_size_s)
+
+    context = zmq.Context()
+    pool = mu.SocketPool(context, node.url_frontend, 1)
+    t_window = time_requests(pool, json.dumps({'type': 'window_stats',
+                                               'channels': channel_names}),
+                             n_requests)
+    t_incremental = time_requests(pool, json.dumps({'type': 'running_stats'}),
+                                  n_requests)
+    pool.close()
+
+    node.stop()
+    run_state.value = 0
+    outlet.join()
+
+    print('{} channels at {} Hz, {:.0f} s buffer'.format(n_channels, fs,
+                                                        buffer_size_s))
+    print('     window: {:8.3f} ms/request'.format(t_window))
+    print('incremental: {:8.3f} ms/request'.format(t_incremental))
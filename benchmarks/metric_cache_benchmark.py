@@ -0,0 +1,35 @@
+#!/usr/bin/env python3
+
+# Measures the metric cache of a node with a spectral metric (Welch's power
+# spectral density) requested repeatedly while no new samples arrive, as
+# happens when many dashboards poll the same node. The node is run first
+# without the cache (metric_cache_size = 0) and then with it, and the request
+# rate and the counters of get_cache_stats are reported.
+#
+# Usage: python metric_cache_benchmark.py [n_samples] [n_requests]
+
+import sys
+import time
+from welch_node import WELCH_REQUEST, start_node, stop_node
+
+
+def run(n_samples, n_requests, cache_size):
+    node, pool = start_node('benchmark_cache', 5321, n_samples,
+                            metric_cache_size=cache_size,
+                            metric_cache_default=True)
+
+    t = time.time()
+    for _ in range(n_requests):
+        pool.request('metric', WELCH_REQUEST)
+    rate = n_requests / (time.time() - t)
+
+    return rate, stop_node(node, pool)
+
+if __name__ == '__main__':
+    n_samples = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    n_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    print('{} samples, {} requests'.format(n_samples, n_requests))
+    for name, cache_size in [('no cache', 0), ('cache', 128)]:
+        rate, stats = run(n_samples, n_requests, cache_size)
+        print('{:>8}: {:8.0f} requests/s {}'.format(name, rate, stats))
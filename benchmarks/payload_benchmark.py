@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+
+# Measures the cost of encoding and decoding a published feature vector:
+# a 'node_name;message' string with the values as JSON, which the subscriber
+# splits and parses, against BaseNode.publish frames (topic, header and the
+# raw array) packed with pack_payload and read with unpack_payload.
+#
+# Usage: python payload_benchmark.py [n_values] [n_messages]
+
+import sys
+import json
+import time
+import numpy as np
+from midas import utilities as mu
+
+
+def string_message(values):
+    message = 'node_name;{}'.format(json.dumps(values.tolist()))
+    node_name, payload = message.split(';', 1)
+    return np.array(json.loads(payload))
+
+
+def frame_message(values):
+    frames = [b'node_name;features'] + mu.pack_payload(values)
+    frames = [bytes(frame) for frame in frames]
+    return mu.unpack_payload(frames)[2]
+
+
+if __name__ == '__main__':
+    n_values = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    n_messages = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+
+    values = np.random.randn(n_values)
+    print('{} values per message'.format(n_values))
+    for name, f in [('string', string_message), ('frames', frame_message)]:
+        assert np.array_equal(f(values), values)
+        t = time.perf_counter()
+        for _ in range(n_messages):
+            f(values)
+        t = time.perf_counter() - t
+        print('{:>7}: {:6.2f} us/message'.format(name, 1e6 * t / n_messages))
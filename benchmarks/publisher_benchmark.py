@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+
+# Measures the publishing rate of a node. A producer process puts messages in
+# the message queue of the node as fast as it can while a subscriber counts
+# the messages it receives. The publisher of the node is compared with the
+# earlier implementation, which polled the queue (of 10 messages) and slept
+# 100 us between messages. Messages the subscriber is too slow for are
+# dropped at its high-water mark and reported as lost.
+#
+# Usage: python publisher_benchmark.py [n_messages] [message_size]
+
+import sys
+import time
+import multiprocessing as mp
+import zmq
+from midas.node import BaseNode
+
+PORT_PUBLISHER = 5321
+
+
+def legacy_publisher(node):
+    """ The publisher before the batched drain. """
+    context = zmq.Context()
+    socket = context.socket(zmq.PUB)
+    socket.bind(node.url_publisher)
+
+    while node.run_state.value:
+        if not node.message_queue.empty():
+            socket.send_string('{};{}'.format(node.node_name,
+                                              node.message_queue.get()))
+        time.sleep(0.0001)
+
+
+def producer(message_queue, n_messages, message):
+    for _ in range(n_messages):
+        message_queue.put(message)
+
+
+def benchmark(publisher, queue_size, n_messages, message_size):
+    node = BaseNode(node_name='benchmark_publisher',
+                    primary_node=False,
+                    ip='127.0.0.1',
+                    port_publisher=PORT_PUBLISHER,
+                    run_publisher=True,
+                    publisher_queue_size=queue_size)
+    node.run_state.value = 1
+
+    proc_publisher = mp.Process(target=publisher, args=(node,))
+    proc_publisher.start()
+
+    context = zmq.Context()
+    socket = context.socket(zmq.SUB)
+    socket.setsockopt(zmq.SUBSCRIBE, b'')
+    socket.setsockopt(zmq.RCVHWM, 0)
+    socket.connect(node.url_publisher)
+    time.sleep(0.5)
+
+    proc_producer = mp.Process(target=producer,
+                               args=(node.message_queue, n_messages,
+                                     'x' * message_size))
+    t_start = time.time()
+    proc_producer.start()
+
+    n = 0
+    while n < n_messages and socket.poll(1000):
+        socket.recv_multipart()
+        n += 1
+    t = time.time() - t_start
+
+    proc_producer.join()
+    node.run_state.value = 0
+    proc_publisher.join()
+    socket.close()
+    context.term()
+
+    return n, n / t, n_messages - n
+
+
+if __name__ == '__main__':
+    n_messages = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    message_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    results = {}
+    results['legacy'] = benchmark(legacy_publisher, 10, n_messages,
+                                  message_size)
+    results['batched'] = benchmark(BaseNode.publisher, 1000, n_messages,
+                                   message_size)
+
+    print('{} messages of {} bytes'.format(n_messages, message_size))
+    for name, (n, rate, lost) in results.items():
+        print('{:>8}: {:6d} received, {:5d} lost, {:8.0f} messages/s'.format(
+            name, n, lost, rate))
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+
+# Measures the sustained ingestion rate of BaseNode.receiver when data is
+# pulled from LSL one sample at a time and in chunks.
+#
+# Usage: python receiver_benchmark.py [n_channels] [sampling_rate] [duration]
+
+import sys
+import time
+import multiprocessing as mp
+import numpy as np
+import pylsl as lsl
+from midas.node import BaseNode
+
+STREAM_NAME = 'MidasBenchmark'
+
+
+def run_outlet(n_channels, fs, run_state):
+    """ Stream random data at fs Hz in blocks of 10 ms. """
+    info = lsl.StreamInfo(STREAM_NAME, 'EEG', n_channels, fs, 'float32',
+                          'midas-benchmark')
+    outlet = lsl.StreamOutlet(info)
+    block = max(1, int(fs / 100))
+    chunk = np.random.randn(block, n_channels).astype(np.float32)
+    t_next = time.time()
+    while run_state.value:
+        outlet.push_chunk(chunk)
+        t_next += block / fs
+        time.sleep(max(0.0, t_next - time.time()))
+
+
+def run_receiver(node, cpu_time):
+    """ Run the receiver and report the CPU time it used. """
+    node.receiver()
+    cpu_time.value = time.process_time()
+
+
+def benchmark(n_channels, fs, duration, chunk_size):
+    node = BaseNode(lsl_stream_name=STREAM_NAME,
+                    primary_n_channels=n_channels,
+                    primary_sampling_rate=fs,
+                    primary_buffer_size_s=10,
+                    primary_chunk_size=chunk_size)
+    node.run_state.value = 1
+
+    cpu_time = mp.Value('d', 0)
+    receiver = mp.Process(target=run_receiver, args=(node, cpu_time))
+    receiver.start()
+
+    # Wait for the first sample before starting the clock
+    while node.primary_buffer.count == 0:
+        time.sleep(0.01)
+
+    count = node.primary_buffer.count
+    t_start = time.time()
+    time.sleep(duration)
+    n_samples = node.primary_buffer.count - count
+    elapsed = time.time() - t_start
+
+    node.run_state.value = 0
+    receiver.join()
+    node.primary_buffer.unlink()
+
+    return n_samples / elapsed, cpu_time.value
+
+
+if __name__ == '__main__':
+    n_channels = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    fs = int(sys.argv[2]) if len(sys.argv) > 2 else 5000
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    run_state = mp.Value('i', 1)
+    outlet = mp.Process(target=run_outlet, args=(n_channels, fs, run_state))
+    outlet.start()
+
+    print('Streaming {} channels at {} Hz'.format(n_channels, fs))
+    for chunk_size in [1, 32, 128]:
+        rate, cpu = benchmark(n_channels, fs, duration, chunk_size)
+        print('chunk size {:>4}: {:>10.0f} samples/s, receiver CPU time {:.2f} s'
+              .format(chunk_size, rate, cpu))
+
+    run_state.value = 0
+    outlet.join()
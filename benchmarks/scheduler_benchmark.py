@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+# Compares the timing of a metric evaluated by the scheduler of a node with
+# a user process sleeping a fixed time between evaluations, as the example
+# nodes used to do. The metric takes a few milliseconds, which the sleeping
+# loop adds to every interval while the scheduler runs at fixed times. The
+# number of runs and the drift of the last run from its nominal time are
+# reported.
+#
+# Usage: python scheduler_benchmark.py [interval] [work_ms] [duration]
+
+import sys
+import time
+import numpy as np
+from midas.node import BaseNode
+from midas import utilities as mu
+
+
+def run(interval, work, duration, scheduled):
+
+    @mu.schedule(interval, secondary_channels=['S1'])
+    def job(x):
+        """ Busy for work seconds, returns the current time. """
+        t = time.time()
+        while time.time() - t < work:
+            pass
+        return t
+
+    def sleeping_process():
+        while node.run_state.value:
+            node.push_sample_secondary(0, time.time(), job(None))
+            time.sleep(interval)
+
+    node = BaseNode(node_name='benchmark_scheduler',
+                    primary_node=False,
+                    ip='127.0.0.1',
+                    port_frontend=5351,
+                    port_backend=5352,
+                    n_responders=1,
+                    secondary_node=True,
+                    secondary_n_channels=1,
+                    secondary_buffer_size=int(10 * duration / interval),
+                    secondary_channel_names=['S1'],
+                    metric_cache_size=0)
+    if scheduled:
+        node.metric_functions.append(job)
+    else:
+        node.process_list.append(sleeping_process)
+
+    node.start()
+    time.sleep(duration)
+    runs = np.array(node.get_data_from_channel('S1')[0])
+    node.stop()
+
+    drift = runs[-1] - (runs[0] + (len(runs) - 1) * interval)
+    return len(runs), drift
+
+
+if __name__ == '__main__':
+    interval = float(sys.argv[1]) if len(sys.argv) > 1 else 0.1
+    work = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.01
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 10
+
+    print('{:.3f} s interval, {:.0f} ms per run, {:.0f} s'.format(
+        interval, 1000 * work, duration))
+    for name, scheduled in [('sleep loop', False), ('scheduler', True)]:
+        runs, drift = run(interval, work, duration, scheduled)
+        print('{:>10}: {:5d} runs, drift {:7.3f} s'.format(name, runs, drift))
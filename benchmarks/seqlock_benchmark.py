@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+
+# Stress test for the primary ring buffer: a writer process (standing in for
+# the receiver) writes chunks at a fixed rate while N reader processes
+# (standing in for responders) snapshot the buffer continuously. The write
+# rate and the worst-case time per chunk write are reported for readers that
+# use the lock of the buffer and for lock-free (seqlock) readers.
+#
+# Usage: python seqlock_benchmark.py [max_readers] [duration]
+
+import sys
+import time
+import multiprocessing as mp
+import numpy as np
+from midas.utilities import RingBuffer
+
+N_CHANNELS = 64
+FS = 20000
+CHUNK = 32
+BUFFER_SIZE = 30 * 500
+
+
+def writer(buf, use_lock, duration, result):
+    """ Write chunks at FS Hz and record the slowest write. """
+    chunk = np.random.randn(CHUNK, N_CHANNELS)
+    times = np.arange(CHUNK, dtype=float)
+    worst = 0.0
+    n = 0
+    t_start = time.time()
+    t_next = t_start
+    while time.time() - t_start < duration:
+        t0 = time.time()
+        if use_lock:
+            with buf.lock:
+                buf.write(chunk, times + n)
+        else:
+            buf.write(chunk, times + n)
+        worst = max(worst, time.time() - t0)
+        n += CHUNK
+        t_next += CHUNK / FS
+        time.sleep(max(0.0, t_next - time.time()))
+    result[0] = n / (time.time() - t_start)
+    result[1] = worst
+
+
+def reader(buf, use_lock, run_state, reads):
+    """ Copy the whole buffer until stopped. """
+    while run_state.value:
+        if use_lock:
+            with buf.lock:
+                buf.copy(range(N_CHANNELS))
+        else:
+            buf.read()
+        with reads.get_lock():
+            reads.value += 1
+
+
+def stress(n_readers, use_lock, duration):
+    buf = RingBuffer(N_CHANNELS, BUFFER_SIZE)
+    buf.write(np.zeros((BUFFER_SIZE, N_CHANNELS)), np.zeros(BUFFER_SIZE))
+
+    run_state = mp.Value('i', 1)
+    reads = mp.Value('i', 0)
+    result = mp.Array('d', 2)
+
+    readers = [mp.Process(target=reader, args=(buf, use_lock, run_state, reads))
+               for _ in range(n_readers)]
+    for p in readers:
+        p.start()
+
+    w = mp.Process(target=writer, args=(buf, use_lock, duration, result))
+    w.start()
+    w.join()
+
+    run_state.value = 0
+    for p in readers:
+        p.join()
+    buf.unlink()
+
+    return result[0], result[1], reads.value / duration
+
+
+if __name__ == '__main__':
+    max_readers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    duration = float(sys.argv[2]) if len(sys.argv) > 2 else 5
+
+    print('Writing {} channels at {} Hz in chunks of {} samples'.format(N_CHANNELS, FS, CHUNK))
+    for use_lock in [True, False]:
+        print('readers using the lock' if use_lock else 'lock-free readers')
+        for n_readers in range(max_readers + 1):
+            rate, worst, reads = stress(n_readers, use_lock, duration)
+            print('  {} readers: {:8.0f} samples/s, slowest write {:7.2f} ms, '
+                  '{:6.0f} snapshots/s'.format(n_readers, rate, 1e3 * worst, reads))
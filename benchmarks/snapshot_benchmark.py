@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+
+# Compares the time needed to snapshot all channels of a full primary buffer
+# using per-channel mp.Arrays and list-based unwrapping (MIDAS <= 1.1) and the
+# shared-memory ring buffer, with and without limiting the snapshot to the
+# last second of data.
+#
+# Usage: python snapshot_benchmark.py [n_channels] [sampling_rate] [buffer_s]
+
+import sys
+import timeit
+import multiprocessing as mp
+import numpy as np
+from midas.node import BaseNode
+
+
+def legacy_snapshot(channel_data, time_array, wptr, buffer_size):
+    """ Snapshot using per-channel mp.Arrays as in MIDAS <= 1.1. """
+    snapshot = []
+    for channel in channel_data:
+        times = time_array[:]
+        data = channel[:]
+        idx = [0] * buffer_size
+        for i in range(buffer_size):
+            idx[i] = (wptr + i) % buffer_size
+        times = [times[i] for i in idx]
+        times = [abs(i - times[-1]) for i in times]
+        data = [data[i] for i in idx]
+        snapshot.append((data, times))
+    return snapshot
+
+
+if __name__ == '__main__':
+    n_channels = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    fs = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    buffer_s = float(sys.argv[3]) if len(sys.argv) > 3 else 30
+
+    channels = [str(c) for c in range(n_channels)]
+    node = BaseNode(lsl_stream_name='benchmark',
+                    primary_n_channels=n_channels,
+                    primary_channel_names=channels,
+                    primary_sampling_rate=fs,
+                    primary_buffer_size_s=buffer_s)
+    buffer_size = node.primary_buffer_size
+
+    # Fill the buffer and leave the write pointer in the middle
+    n = buffer_size + buffer_size // 2
+    values = np.random.randn(n, n_channels)
+    times = np.arange(n) / fs
+    node.primary_buffer.write(values, times)
+
+    channel_data = [mp.Array('d', node.primary_buffer.data[k].tolist())
+                    for k in range(n_channels)]
+    time_array = mp.Array('d', node.primary_buffer.time.tolist())
+    wptr = node.primary_buffer.wptr
+
+    print('{} channels, {} samples per channel'.format(n_channels, buffer_size))
+
+    t = min(timeit.repeat(lambda: legacy_snapshot(channel_data, time_array,
+                                                  wptr, buffer_size),
+                          number=1, repeat=5))
+    print('mp.Array + list unwrap : {:8.2f} ms'.format(1e3 * t))
+
+    t = min(timeit.repeat(lambda: node.snapshot_data(channels),
+                          number=1, repeat=5))
+    print('ring buffer            : {:8.2f} ms'.format(1e3 * t))
+
+    t = min(timeit.repeat(lambda: node.snapshot_data(channels, 1.0),
+                          number=1, repeat=5))
+    print('ring buffer, last 1 s  : {:8.2f} ms'.format(1e3 * t))
+
+    node.primary_buffer.unlink()
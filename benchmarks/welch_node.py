@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+
+# Node shared by the benchmarks of the metric cache and of request
+# coalescing: one secondary channel of random samples and an expensive
+# metric (the total power from Welch's power spectral density), requested
+# over a pool of connections.
+
+import json
+import numpy as np
+import zmq
+from scipy import signal
+from midas.node import BaseNode
+from midas import utilities as mu
+
+
+def welch_power(x, nperseg=256):
+    """ Total power of the first channel from Welch's estimate. """
+    f, p = signal.welch(x['data'][0], nperseg=nperseg)
+    return float(np.sum(p) * (f[1] - f[0]))
+
+
+# the request the benchmarks send
+WELCH_REQUEST = json.dumps({'type': 'welch_power',
+                            'channels': ['S1'],
+                            'arguments': [256]})
+
+
+def start_node(node_name, port, n_samples, pool_size=1, **options):
+    """ Start a node with n_samples samples in the secondary channel S1.
+
+    Args:
+        node_name: <str> name of the node
+        port: <int> frontend port of the node, port + 1 is the backend
+        n_samples: <int> number of samples (and size of the buffer)
+        pool_size: <int> number of connections to the node
+        options: further options of BaseNode
+    Returns:
+        node: <BaseNode> the running node
+        pool: <SocketPool> connections to the node
+    """
+    node = BaseNode(node_name=node_name,
+                    primary_node=False,
+                    ip='127.0.0.1',
+                    port_frontend=port,
+                    port_backend=port + 1,
+                    secondary_node=True,
+                    secondary_n_channels=1,
+                    secondary_buffer_size=n_samples,
+                    secondary_channel_names=['S1'],
+                    **options)
+    node.metric_functions.append(welch_power)
+    node.push_chunk_secondary(0, list(range(n_samples)),
+                              np.random.randn(n_samples))
+    node.start()
+
+    pool = mu.SocketPool(zmq.Context(), node.url_frontend, pool_size)
+    return node, pool
+
+
+def stop_node(node, pool):
+    """ Return the cache statistics of the node and stop it. """
+    stats = pool.request('command', 'get_cache_stats')
+    stats = json.loads(stats[0].bytes)
+
+    pool.close()
+    node.stop()
+    return stats
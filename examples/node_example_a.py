@@ -1,9 +1,8 @@
 #!/usr/bin/env python3
 
 import sys
-import time
 import numpy as np
-from midas.node import BaseNode, lsl
+from midas.node import BaseNode
 from midas import utilities as mu
 
 
@@ -21,7 +20,12 @@ class NodeExampleA(BaseNode):
         self.metric_functions.append(self.metric_a)
         self.metric_functions.append(self.echo)
         self.metric_functions.append(metric_b)
-        self.process_list.append(self.process_x)
+        # Incremental metrics are updated as samples arrive, requesting them
+        # only reads their latest value.
+        self.incremental_metrics.append(RunningStats('running_stats'))
+        self.metric_functions.append(self.stats)
+        # Topics published by the node (see stats)
+        self.topic_list['stats'] = 'Mean and standard deviation of channel 0'
 
     # Metric function can be defined as class methods so that they can
     # access the class attributes. This enables some additional functionality.
@@ -46,42 +50,30 @@ class NodeExampleA(BaseNode):
         print('<<< ECHO-END')
         return 1
 
-    # Processes are class methods that loop while the node is running. A process
-    # can be used to calculate and push new values into secondary data channels.
-    def process_x(self):
-        """ Automatically calculates values for two secondary channels. """
-        # Process loops while the node is running. Variable run_state.value is
-        # the poison-pill of the node.
-        channel_name = self.primary_channel_names[0]
-        while self.run_state.value:
-            # Snapshot and unpack 10 seconds of 'primary' data from channel 0
-            snapshot = self.snapshot_data([channel_name])
-            data, times = self.unpack_snapshot(snapshot,
-                                               [channel_name],
-                                               [10, 10])
-            # Calculate mean and standard deviation of this 10 second chunk from
-            # channel 0
-            if data[0]:
-                new_value1 = np.mean(data[0])
-                new_value2 = np.std(data[0])
-            else:
-                new_value1 = 0.0
-                new_value2 = 0.0
-            # Obtain a time-stamp for new values
-            time_stamp = lsl.local_clock()
-            # Push mean to 1st secondary data channel
-            self.push_sample_secondary(0, time_stamp, new_value1)
-            # Push standard deviation to 2nd secondary data channel
-            self.push_sample_secondary(1, time_stamp, new_value2)
-            # Sleep until next sample (note: for accurate timing you don't want
-            # to use time.sleep)
-            time.sleep(1.0)
+    # Scheduled metrics are evaluated by the scheduler of the node at a fixed
+    # interval (which can be changed with the option 'schedule' in the
+    # ini-file). The result is pushed into the given secondary channels, one
+    # value per channel, and published on the given topic. Subscribers
+    # receive it with mu.unpack_payload.
+    @mu.schedule(1.0, channels=['Ch1'], time_window=[10, 10],
+                 secondary_channels=['S-Ch1', 'S-Ch2'], topic='stats')
+    def stats(self, x):
+        """ Mean and standard deviation of 10 seconds of channel 0. """
+        if len(x['data'][0]):
+            return np.array([np.mean(x['data'][0]), np.std(x['data'][0])]).tolist()
+        else:
+            return np.zeros(2).tolist()
 
 
 # Metric functions can also exist outside the class as long as they are added
 # to the metric_functions-list in node __init__. These "outside" functions have,
 # however, no access to class attributes. Note that it is also possible to
 # include metric functions from a completely separate module.
+#
+# The decorator metric_cache caches the results of the metric: a request is
+# only calculated again when new samples have arrived. Use it for metrics that
+# depend on nothing but their data and arguments.
+@mu.metric_cache()
 def metric_b(x, arg1=0, arg2=0):
     """ Returns 'metric b'. Takes two additional arguments."""
     b1 = np.max(x['data'][0]) - arg1
@@ -90,6 +82,38 @@ def metric_b(x, arg1=0, arg2=0):
     return b
 
 
+# Incremental metrics are classes derived from IncrementalMetric. The receiver
+# of the node calls update with each chunk of new samples, and value is what
+# a request for the metric returns.
+class RunningStats(mu.IncrementalMetric):
+    """ Mean and variance of each primary channel since the node started. """
+
+    def init(self):
+        self.n = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, data, times):
+        # Combine the statistics of the chunk with the previous ones
+        # (Chan et al.), which works for single samples as well
+        data = np.asarray(data, dtype=np.float64)
+        n = len(data)
+        mean = np.mean(data, axis=0)
+        m2 = np.sum((data - mean) ** 2, axis=0)
+
+        delta = mean - self.mean
+        total = self.n + n
+        self.mean = self.mean + delta * n / total
+        self.m2 = self.m2 + m2 + delta ** 2 * self.n * n / total
+        self.n = total
+
+    def value(self):
+        if self.n < 2:
+            return None
+        return {'mean': np.atleast_1d(self.mean).tolist(),
+                'variance': np.atleast_1d(self.m2 / (self.n - 1)).tolist()}
+
+
 # ------------------------------------------------------------------------------
 # Run the node if started from the command line
 # ------------------------------------------------------------------------------
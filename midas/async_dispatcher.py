@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+
+# This file is part of the MIDAS system.
+# Copyright 2014
+# Andreas Henelius <andreas.henelius@ttl.fi>,
+# Jari Torniainen <jari.torniainen@ttl.fi>
+# Finnish Institute of Occupational Health
+#
+# This code is released under the MIT License
+# http://opensource.org/licenses/mit-license.php
+#
+# Please see the file LICENSE for details.
+
+""" asyncio web server for the MIDAS Dispatcher (server = asyncio).
+
+    The routes are the same as those of Dispatcher.start, but requests are
+    served by aiohttp in a single event loop. Requests to a node are
+    multiplexed over one DEALER socket per node, so the number of requests in
+    progress is not limited by a number of server threads.
+
+    Requires aiohttp (pip install midas[asyncio]).
+"""
+
+import json
+import time
+import random
+import asyncio
+import zmq
+import zmq.asyncio
+from aiohttp import web
+from . import utilities as mu
+
+
+class AsyncNodeConnection(object):
+
+    """ A DEALER socket connected to a node, carrying many requests at once.
+
+        Every request is sent as [request id][empty][message type][message].
+        The broker of the node returns the envelope with the reply, which
+        is used to hand the reply to the waiting request.
+    """
+
+    def __init__(self, context, address):
+        """ Connect to the node and start reading replies.
+
+        Args:
+            context: <zmq.asyncio.Context> context used for the socket
+            address: <str> ZeroMQ URL of the node
+        """
+        self.address = address
+        self.socket = context.socket(zmq.DEALER)
+        self.socket.setsockopt(zmq.LINGER, 0)
+        self.socket.connect(address)
+
+        self.pending = {}
+        self.next_id = 0
+        self.reader = asyncio.ensure_future(self.read_replies())
+
+    async def read_replies(self):
+        """ Resolve the pending requests as their replies arrive. Replies to
+            requests that have timed out are dropped.
+        """
+        while True:
+            frames = await self.socket.recv_multipart(copy=False)
+            future = self.pending.pop(frames[0].bytes, None)
+            if future is not None and not future.done():
+                future.set_result(frames[2:])
+
+    async def request(self, message_type, message, timeout=None):
+        """ Send a request to the node and wait for the reply.
+
+        Args:
+            message_type: <str> type of the message
+            message: <str> the message
+            timeout: <float> seconds to wait for the reply, None waits forever
+        Returns:
+            frames: <list> the frames of the reply, None on timeout
+        """
+        self.next_id += 1
+        request_id = self.next_id.to_bytes(8, 'little')
+
+        future = asyncio.get_event_loop().create_future()
+        self.pending[request_id] = future
+
+        try:
+            await self.socket.send_multipart([request_id,
+                                              b"",
+                                              message_type.encode(),
+                                              message.encode()])
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self.pending.pop(request_id, None)
+
+    def close(self):
+        """ Stop reading replies and close the socket. """
+        self.reader.cancel()
+        self.socket.close()
+
+
+class AsyncServer(object):
+
+    """ Serves the routes of a Dispatcher with aiohttp. Node discovery and
+        the publisher-subscriber proxy are run by the Dispatcher as usual.
+    """
+
+    def __init__(self, dispatcher):
+        """ Create the server.
+
+        Args:
+            dispatcher: <Dispatcher> the dispatcher whose nodes are served
+        """
+        self.dispatcher = dispatcher
+        self.connections = {}
+
+    def get_connection(self, node):
+        """ Return the connection to a node, reconnecting if the address of
+            the node has changed.
+        """
+        address = self.dispatcher.node_addresses[node]['address']
+
+        connection = self.connections.get(node)
+        if connection is None or connection.address != address:
+            if connection is not None:
+                connection.close()
+            connection = AsyncNodeConnection(self.context, address)
+            self.connections[node] = connection
+        return connection
+
+    def close_stale_connections(self):
+        """ Close the connections to nodes that have gone or moved, see
+            Dispatcher.discover_nodes.
+        """
+        node_addresses = self.dispatcher.node_addresses
+        for node in list(self.connections):
+            if (node not in node_addresses or
+                    node_addresses[node]['address'] !=
+                    self.connections[node].address):
+                self.connections.pop(node).close()
+
+    async def node_request(self, node, message_type, message):
+        """ Send a request to a node. Fails with HTTP 504 if the node does
+            not reply within request_timeout seconds.
+
+        Returns:
+            frames: <list> the frames of the reply
+        """
+        timeout = self.dispatcher.request_timeout
+        frames = await self.get_connection(node).request(message_type,
+                                                         message,
+                                                         timeout)
+        if frames is None:
+            raise self.error_response(504, 'node did not reply within {} s'
+                                      .format(timeout))
+        return frames
+
+    def format_json(self, request, data):
+        """ Format data as JSON, see Dispatcher.format_json. """
+        return self.pass_json(request, json.dumps(data,
+                                                  sort_keys=True,
+                                                  indent=4,
+                                                  separators=(',', ' : ')))
+
+    def pass_json(self, request, data):
+        """ Pass data that already is JSON, see Dispatcher.pass_json. """
+        callback_function = request.query.get('callback')
+
+        if callback_function:
+            data = '{}({})'.format(callback_function, data)
+
+        return web.Response(text=data, content_type='application/json')
+
+    def error_response(self, status, message):
+        """ Return an HTTP error with a JSON body, to be raised in a route. """
+        error = {503: web.HTTPServiceUnavailable,
+                 504: web.HTTPGatewayTimeout}[status]
+        return error(text=json.dumps({'error': message},
+                                     sort_keys=True,
+                                     indent=4,
+                                     separators=(',', ' : ')),
+                     content_type='application/json')
+
+    def binary_requested(self, request):
+        """ See Dispatcher.binary_requested. """
+        if request.query.get('format') == 'binary':
+            return True
+
+        return 'application/octet-stream' in request.headers.get('Accept', '')
+
+# =============================================================================
+# Route definitions, see the Dispatcher for the documentation
+# =============================================================================
+
+    async def root(self, request):
+        return web.Response(text='MIDAS Dispatcher online.')
+
+    async def status_nodes(self, request):
+        return self.format_json(request, self.dispatcher.node_addresses)
+
+    def status(self, request, properties):
+        """ Return the properties of the node in the route or of all nodes.
+        """
+        node = request.match_info.get('node')
+
+        if node and node in properties:
+            return self.format_json(request, properties[node])
+        else:
+            return self.format_json(request, properties)
+
+    async def status_metrics(self, request):
+        return self.status(request, self.dispatcher.node_metrics)
+
+    async def status_data(self, request):
+        return self.status(request, self.dispatcher.node_data)
+
+    async def status_topics(self, request):
+        return self.status(request, self.dispatcher.node_topics)
+
+    async def status_publisher(self, request):
+        if self.dispatcher.run_pubsub_proxy:
+            return self.format_json(request,
+                                    {'url': self.dispatcher.url_proxy_out})
+        else:
+            return self.format_json(request, {'error': 'proxy not running'})
+
+    async def status_nodeinfo(self, request):
+        node = request.match_info['node']
+
+        if node in self.dispatcher.node_addresses:
+            results = await self.node_request(node, 'command', 'get_nodeinfo')
+            return self.pass_json(request, results[0].bytes.decode())
+        else:
+            return self.format_json(request, {'error': 'node not available'})
+
+    async def get_metric(self, request):
+        node = request.match_info['node']
+
+        if node in self.dispatcher.node_addresses:
+            result = await self.node_request(node, 'metric',
+                                             request.match_info['requests'])
+            return self.pass_json(request, result[0].bytes.decode())
+        else:
+            return self.format_json(request, {'error': 'node not available'})
+
+    async def get_metric_nodes(self, request):
+        try:
+            node_requests = json.loads(request.match_info['requests'])
+        except ValueError:
+            node_requests = None
+
+        if not isinstance(node_requests, dict):
+            return self.format_json(request,
+                                    {'error': 'requests must be a JSON object '
+                                              'of node names and requests'})
+
+        time_start = time.time()
+
+        async def node_metric(node):
+            if node not in self.dispatcher.node_addresses:
+                return {'error': 'node not available'}
+
+            timeout = self.dispatcher.request_timeout
+            frames = await self.get_connection(node).request(
+                'metric', json.dumps(node_requests[node]), timeout)
+            if frames is None:
+                return {'error': 'node did not reply within {} s'
+                        .format(timeout)}
+            return {'return': json.loads(frames[0].bytes),
+                    'latency': time.time() - time_start}
+
+        nodes = list(node_requests)
+        replies = await asyncio.gather(*[node_metric(node) for node in nodes])
+        return self.format_json(request, dict(zip(nodes, replies)))
+
+    async def get_data(self, request):
+        node = request.match_info['node']
+        requests = request.match_info['requests']
+
+        if node in self.dispatcher.node_addresses:
+            if self.binary_requested(request):
+                frames = await self.node_request(node, 'data_binary', requests)
+                return web.Response(
+                    body=b''.join(frame.buffer for frame in frames),
+                    content_type='application/octet-stream')
+
+            data = await self.node_request(node, 'data', requests)
+            return self.pass_json(request, data[0].bytes.decode())
+        else:
+            return self.format_json(request, {node: 'not available'})
+
+    async def get_stream(self, request):
+        node = request.match_info['node']
+        dispatcher = self.dispatcher
+
+        if node not in dispatcher.node_addresses:
+            return self.format_json(request, {node: 'not available'})
+
+        if not dispatcher.node_publisher_urls.get(node):
+            return self.format_json(request, {'error': 'node has no publisher'})
+
+        try:
+            channels = json.loads(request.match_info['requests']).get('channels')
+        except (ValueError, AttributeError):
+            return self.format_json(request, {'error': 'malformed request'})
+
+        if channels is None:
+            channels = list(dispatcher.node_data.get(node, {}))
+
+        response = web.StreamResponse()
+        response.content_type = 'application/x-ndjson'
+        await response.prepare(request)
+
+        socket = self.context.socket(zmq.SUB)
+        socket.setsockopt(zmq.LINGER, 0)
+        for channel in channels:
+            topic = '{};data/{}'.format(node, channel)
+            socket.setsockopt(zmq.SUBSCRIBE, topic.encode())
+        socket.connect(dispatcher.node_publisher_urls[node])
+
+        try:
+            while dispatcher.run_state:
+                # an empty line now and then notices closed connections
+                if not await socket.poll(1000):
+                    await response.write(b'\n')
+                    continue
+
+                _, topic, samples = mu.unpack_payload(
+                    await socket.recv_multipart(copy=False))
+
+                # subscriptions match prefixes, e.g., Ch1 matches Ch10
+                channel = topic[len('data/'):]
+                if channel not in channels:
+                    continue
+
+                line = json.dumps({'channel': channel,
+                                   'data': samples[0].tolist(),
+                                   'time': samples[1].tolist()}) + '\n'
+                await response.write(line.encode())
+        except ConnectionResetError:
+            pass
+        finally:
+            socket.close()
+
+        return response
+
+    async def get_test(self, request):
+        return self.format_json(request, {'test': random.uniform(0, 1)})
+
+    async def ping_node(self, request):
+        node = request.match_info['node']
+
+        if node in self.dispatcher.node_addresses:
+            latencies = []
+            for _ in range(int(request.match_info['num'])):
+                time_sent = time.time()
+                ping = await self.node_request(node, 'ping', 'ping')
+                ping = float(ping[0].bytes)
+                latencies.append(time.time() - time_sent - ping)
+            return self.format_json(request, {node + "_RTT": latencies})
+        else:
+            return self.format_json(request, {node: 'not available'})
+
+    def make_app(self):
+        """ Create the aiohttp application with the routes of the
+            Dispatcher.
+        """
+        app = web.Application()
+        app.router.add_get('/', self.root)
+        app.router.add_get('/{node}/metric/{requests:[^/]+}', self.get_metric)
+        app.router.add_get('/{node}/data/{requests:[^/]+}', self.get_data)
+        app.router.add_get('/{node}/stream/{requests:[^/]+}', self.get_stream)
+        app.router.add_get('/metric/{requests:[^/]+}', self.get_metric_nodes)
+
+        # Status request routes
+        app.router.add_get('/status/nodes', self.status_nodes)
+        app.router.add_get('/status/metrics', self.status_metrics)
+        app.router.add_get('/status/data', self.status_data)
+        app.router.add_get('/status/topics', self.status_topics)
+        app.router.add_get('/status/publisher', self.status_publisher)
+
+        # Node status request routes
+        app.router.add_get('/{node}/status/metrics', self.status_metrics)
+        app.router.add_get('/{node}/status/data', self.status_data)
+        app.router.add_get('/{node}/status/topics', self.status_topics)
+
+        # 'On-demand' status request routes
+        app.router.add_get('/{node}/status/info', self.status_nodeinfo)
+
+        # Test method
+        app.router.add_get('/test', self.get_test)
+
+        # Ping method
+        app.router.add_get('/{node}/ping/{num}', self.ping_node)
+
+        return app
+
+    def serve(self, host, port):
+        """ Run the web server until the process exits. """
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self.context = zmq.asyncio.Context()
+
+        # the dispatcher learns about nodes in the registry thread, the
+        # connections are closed in the event loop
+        self.dispatcher.node_callbacks.append(
+            lambda: loop.call_soon_threadsafe(self.close_stale_connections))
+
+        web.run_app(self.make_app(), host=host, port=port,
+                    print=None, handle_signals=False, loop=loop)
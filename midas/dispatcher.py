@@ -33,7 +33,12 @@ class Dispatcher():
                  node_list=None,
                  port=8080,
                  ip=None,
+                 server='waitress',
                  n_threads=5,
+                 request_timeout=10.0,
+                 node_concurrency=None,
+                 max_streams=None,
+                 node_ttl=15,
                  run_pubsub_proxy=False,
                  proxy_port_in=None,
                  proxy_port_out=None):
@@ -44,7 +49,16 @@ class Dispatcher():
             node_list: <list> list of node types to discover
             port: <int> port number for the web server
             ip: <str> IP for the web server
+            server: <str> web server, 'waitress' (threads) or 'asyncio'
+                    (aiohttp, requires the package aiohttp)
             n_threasds: <int> number of threads
+            request_timeout: <float> seconds to wait for the reply of a node
+            node_concurrency: <int> maximum number of concurrent requests to
+                              one node (default n_threads - 1)
+            max_streams: <int> maximum number of concurrent streams, less
+                         than n_threads (default n_threads // 2)
+            node_ttl: <float> seconds after which a node that has not been
+                      heard from is removed
         """
 
         self.node_addresses = {}
@@ -53,18 +67,28 @@ class Dispatcher():
         self.node_indices = {}
         self.node_topics = {}
         self.node_publisher_urls = {}
-        self.node_publisher_connected = []
+        self.node_publisher_connected = set()
 
         # server settings
         if config:
             if 'port' in config:
                 port = int(config['port'])
-            if 'threads' in config:
-                n_threads = config['threads']
+            if 'n_threads' in config:
+                n_threads = int(config['n_threads'])
+            if 'request_timeout' in config:
+                request_timeout = float(config['request_timeout'])
+            if 'node_concurrency' in config:
+                node_concurrency = int(config['node_concurrency'])
+            if 'max_streams' in config:
+                max_streams = int(config['max_streams'])
+            if 'node_ttl' in config:
+                node_ttl = float(config['node_ttl'])
             if 'node_list' in config:
                 node_list = mu.listify(config, 'node_list')
             if 'ip' in config:
                 ip = config['ip']
+            if 'server' in config:
+                server = config['server'].lower().strip()
             if 'run_pubsub_proxy' in config:
                 run_pubsub_proxy = mu.str2bool(config['run_pubsub_proxy'])
             if 'proxy_port_in' in config:
@@ -74,8 +98,28 @@ class Dispatcher():
 
         self.port = port
         self.n_threads = n_threads
+
+        if server not in ['waitress', 'asyncio']:
+            raise ValueError("server must be 'waitress' or 'asyncio'")
+        self.server = server
         self.node_list = node_list
 
+        # A slow node may only occupy some of the server threads, so that
+        # requests to other nodes can still be served
+        if node_concurrency is None:
+            node_concurrency = max(1, n_threads - 1)
+        self.node_concurrency = node_concurrency
+        self.request_timeout = request_timeout
+
+        # A stream holds a server thread while the client is connected, so
+        # streams may only occupy some of the threads
+        if max_streams is None:
+            max_streams = n_threads // 2
+        if server == 'waitress' and max_streams >= n_threads:
+            raise ValueError('max_streams must be less than n_threads')
+        self.max_streams = max_streams
+        self.stream_slots = threading.BoundedSemaphore(max_streams)
+
         self.run_pubsub_proxy = run_pubsub_proxy
         self.proxy_port_in = proxy_port_in
         self.proxy_port_out = proxy_port_out
@@ -97,85 +141,129 @@ class Dispatcher():
 
         self.context = zmq.Context()
 
-        # create a variable that tracks if there are new publishers
-        self.new_publisher = mu.DataState(0)
+        # pools of persistent connections to the nodes, the size of a pool
+        # is the concurrency limit of the node
+        self.pools = {}
+        self.pools_lock = threading.Lock()
 
-        # set update interval (in seconds) for node discovery
+        # the publisher-subscriber proxy is controlled over this socket
+        self.url_proxy_control = 'inproc://pubsub-control'
+
+        # set update interval (in seconds) for node properties
         self.discovery_interval = 10
 
-        # Initially discover all nodes and metrics
-        self.discover_nodes()
-        if self.node_addresses:
-            self.discover_node_properties()
+        # Nodes are discovered in the background once the dispatcher is
+        # started. The properties are updated as soon as nodes come and go.
+        self.nodes_changed = threading.Event()
 
-    def pubsub_proxy(self, context):
+        # functions called (from the registry thread) after the address book
+        # has been updated, e.g. by the asyncio server
+        self.node_callbacks = []
+
+        self.registry = mu.NodeRegistry(ttl=node_ttl,
+                                        on_add=self.node_event,
+                                        on_remove=self.node_event)
+
+    def pubsub_proxy(self):
         """ Run proxy for publisher-subscriber.
 
             The nodes are publishing messages on various addresses, and
-            the proxy relays all of these through one address.
+            the proxy relays all of these through one address. The proxy is
+            connected to new publishers (and disconnected from publishers
+            that are gone) through a control socket while it is running, so
+            messages are not lost when nodes join or leave.
         """
 
-        # create sockets and bind
-        socket_proxy_in = context.socket(zmq.XSUB)
-        socket_proxy_out = context.socket(zmq.XPUB)
+        # create sockets, the XSUB socket is connected to the publishers
+        socket_proxy_in = self.context.socket(zmq.XSUB)
+        socket_proxy_out = self.context.socket(zmq.XPUB)
+        socket_control = self.context.socket(zmq.PULL)
 
         socket_proxy_out.bind(self.url_proxy_out)
-
-        self.node_publisher_connected = []
-        for nodename in self.node_publisher_urls:
-            publisher_url = self.node_publisher_urls[nodename]
-            socket_proxy_in.bind(publisher_url)
-            self.node_publisher_connected.append(publisher_url)
-        self.new_publisher.setstate(0)
-
-        try:
-            zmq.proxy(socket_proxy_in, socket_proxy_out)
-        except zmq.error.ContextTerminated:
-            pass
-
-    def pubsub_proxy_watchdog(self):
-        """ A watchdog function that starts the publisher-subscriber proxy and
-            monitors if there are new  publishers. In case of new publishers,
-            the proxy is restarted.
-
-            In the restarting process some messages may be lost.
+        socket_control.bind(self.url_proxy_control)
+
+        poller = zmq.Poller()
+        poller.register(socket_proxy_in, zmq.POLLIN)
+        poller.register(socket_proxy_out, zmq.POLLIN)
+        poller.register(socket_control, zmq.POLLIN)
+
+        while True:
+            sockets = dict(poller.poll())
+
+            # relay all published messages that have arrived
+            if socket_proxy_in in sockets:
+                while True:
+                    try:
+                        frames = socket_proxy_in.recv_multipart(zmq.NOBLOCK,
+                                                                copy=False)
+                    except zmq.Again:
+                        break
+                    socket_proxy_out.send_multipart(frames, copy=False)
+
+            # pass subscriptions to the publishers
+            if socket_proxy_out in sockets:
+                socket_proxy_in.send_multipart(socket_proxy_out.recv_multipart())
+
+            if socket_control in sockets:
+                command, url = socket_control.recv_multipart()
+                if command == b'connect':
+                    socket_proxy_in.connect(url.decode())
+                elif command == b'disconnect':
+                    socket_proxy_in.disconnect(url.decode())
+                elif command == b'stop':
+                    break
+
+        socket_proxy_in.close()
+        socket_proxy_out.close()
+        socket_control.close()
+
+    def update_publishers(self):
+        """ Connect the publisher-subscriber proxy to the publishers of new
+            nodes, and disconnect it from the publishers of nodes that are
+            gone.
         """
 
-        proxy_running = False
-        context = None
+        if not self.run_pubsub_proxy:
+            return
 
-        while self.run_state:
-            if self.new_publisher.getstate() == 1:
+        urls = set(url for url in self.node_publisher_urls.values() if url)
 
-                if proxy_running:
-                    if context:
-                        context.term()
-                        proxy_running = False
-                else:
-                    context = zmq.Context()
-                    psproxy = threading.Thread(target=self.pubsub_proxy,
-                                               args=(context,))
-                    psproxy.start()
-                    proxy_running = True
+        socket_control = self.context.socket(zmq.PUSH)
+        socket_control.connect(self.url_proxy_control)
+        for url in urls - self.node_publisher_connected:
+            socket_control.send_multipart([b'connect', url.encode()])
+        for url in self.node_publisher_connected - urls:
+            socket_control.send_multipart([b'disconnect', url.encode()])
+        socket_control.close()
 
-                time.sleep(0.0001)
+        self.node_publisher_connected = urls
 
     def update_nodes(self):
-        """ Update nodes and corresponding metrics.
+        """ Update the properties of the nodes when nodes have been added
+            or removed, and otherwise every discovery_interval seconds.
         """
 
         while self.run_state:
-            self.discover_nodes()
-            if self.node_addresses:
+            self.nodes_changed.wait(self.discovery_interval)
+            self.nodes_changed.clear()
+            if self.run_state:
                 self.discover_node_properties()
-            time.sleep(self.discovery_interval)
+
+    def node_event(self, *args):
+        """ Called by the node registry when a node has been added, changed
+            or removed.
+        """
+        self.discover_nodes()
+        self.nodes_changed.set()
+        for callback in self.node_callbacks:
+            callback()
 
     def discover_nodes(self):
-        """ Find all nodes that are online.
+        """ Update the address book from the nodes that are online.
         """
 
         new_nodes = {}
-        all_nodes = mu.discover_all_nodes(timeout=5)
+        all_nodes = self.registry.get_nodes()
 
         if self.node_list is not None:
             for node in all_nodes:
@@ -185,55 +273,224 @@ class Dispatcher():
         else:
             self.node_addresses = all_nodes
 
-    def discover_node_properties(self):
-        """ Discover the properties of nodes in our address book.
+        # close the connections to nodes that have gone or moved
+        with self.pools_lock:
+            for node in list(self.pools):
+                if (node not in self.node_addresses or
+                        self.node_addresses[node]['address'] !=
+                        self.pools[node].address):
+                    self.pools.pop(node).close()
+
+    def get_pool(self, node):
+        """ Return the connection pool of a node, creating it on first use.
+
+        Args:
+            node: <str> name of the node
+        Returns:
+            pool: <SocketPool> the connection pool
         """
+        address = self.node_addresses[node]['address']
+
+        with self.pools_lock:
+            pool = self.pools.get(node)
+            if pool is None or pool.address != address:
+                if pool is not None:
+                    pool.close()
+                pool = mu.SocketPool(self.context, address,
+                                     self.node_concurrency)
+                self.pools[node] = pool
+        return pool
+
+    def node_request(self, node, message_type, message):
+        """ Send a request to a node over a pooled connection.
+
+            If the node already has node_concurrency requests in progress,
+            the request waits for one of them to finish. Fails with HTTP 503
+            if no connection becomes free and with HTTP 504 if the node does
+            not reply, both within request_timeout seconds in total.
 
-        new_metrics = {}
-        new_data = {}
-        new_indices = {}
-        new_topics = {}
-        new_publisher_urls = {}
+        Args:
+            node: <str> name of the node
+            message_type: <str> type of the message
+            message: <str> the message
+        Returns:
+            frames: <list> the frames of the reply
+        """
+        pool = self.get_pool(node)
 
-        new_publishers = 0
+        time_start = time.time()
+        socket = pool.acquire(timeout=self.request_timeout)
+        if socket is None:
+            raise self.error_response(503, 'node busy')
 
-        for node in self.node_addresses:
-            if node:
-                socket_tmp = self.context.socket(zmq.REQ)
-                socket_tmp.connect(self.node_addresses[node]['address'])
+        if self.request_timeout is None:
+            timeout = None
+        else:
+            timeout = max(0, self.request_timeout - (time.time() - time_start))
 
-                # Get metric list
-                mu.midas_send(socket_tmp, 'command', 'get_metric_list')
-                node_metric_list = json.loads(socket_tmp.recv_string())
-                new_metrics.update({node: node_metric_list})
+        frames = pool.send_recv(socket, message_type, message, timeout)
+        if frames is None:
+            raise self.error_response(504, 'node did not reply within {} s'
+                                      .format(self.request_timeout))
+        return frames
 
-                # Get data list
-                mu.midas_send(socket_tmp, 'command', 'get_data_list')
-                node_data_list = json.loads(socket_tmp.recv_string())
-                new_data.update({node: node_data_list})
+    def node_request_many(self, message_type, messages):
+        """ Send requests to several nodes at once and wait for all the
+            replies, for at most request_timeout seconds in total.
 
-                # Get topic list
-                mu.midas_send(socket_tmp, 'command', 'get_topic_list')
-                node_topic_list = json.loads(socket_tmp.recv_string())
-                new_topics.update({node: node_topic_list})
+            A node that already has node_concurrency requests in progress
+            gets its request as soon as one of them finishes; the replies of
+            the other nodes are collected meanwhile.
 
-                # Get publisher URLs
-                mu.midas_send(socket_tmp, 'command', 'get_publisher')
-                node_publisher_url = json.loads(socket_tmp.recv_string())
-                new_publisher_urls.update({node: node_publisher_url})
+        Args:
+            message_type: <str> type of the messages
+            messages: <dict> node name -> message
+        Returns:
+            replies: <dict> node name -> {'reply': <list> frames of the reply,
+                     'latency': <float> seconds} or {'error': <str>}
+        """
+        replies = {}
+        pending = {}
+        busy = []
+        poller = zmq.Poller()
+
+        # seconds between attempts to take a socket of a busy node
+        retry_interval = 0.01
+
+        time_start = time.time()
+        for node in messages:
+            if node in self.node_addresses:
+                busy.append(node)
+            else:
+                replies[node] = {'error': 'node not available'}
+
+        # send the requests as soon as the nodes have a free socket and
+        # collect the replies in the order they arrive
+        while busy or pending:
+            for node in list(busy):
+                pool = self.get_pool(node)
+                socket = pool.acquire(block=False)
+                if socket is None:
+                    continue
+                busy.remove(node)
+
+                try:
+                    mu.midas_send(socket, message_type, messages[node])
+                except zmq.ZMQError as e:
+                    pool.release(socket, broken=True)
+                    replies[node] = {'error': str(e)}
+                    continue
+
+                pending[socket] = (node, pool)
+                poller.register(socket, zmq.POLLIN)
+
+            if self.request_timeout is None:
+                timeout = None
+            else:
+                timeout = self.request_timeout - (time.time() - time_start)
+                if timeout <= 0:
+                    break
+            if busy:
+                timeout = min(timeout or retry_interval, retry_interval)
+
+            if not pending:
+                time.sleep(timeout)
+                continue
+
+            if timeout is not None:
+                timeout *= 1000
+
+            for socket, _ in poller.poll(timeout):
+                node, pool = pending.pop(socket)
+                poller.unregister(socket)
+                try:
+                    frames = mu.midas_recv_reply(socket)
+                except zmq.ZMQError as e:
+                    pool.release(socket, broken=True)
+                    replies[node] = {'error': str(e)}
+                    continue
+                pool.release(socket)
+                replies[node] = {'reply': frames,
+                                 'latency': time.time() - time_start}
+
+        # the sockets of nodes that did not reply can not be used again
+        for socket, (node, pool) in pending.items():
+            pool.release(socket, broken=True)
+            replies[node] = {'error': 'node did not reply within {} s'
+                             .format(self.request_timeout)}
+
+        for node in busy:
+            replies[node] = {'error': 'node busy'}
+
+        return replies
+
+    def discover_node_properties(self):
+        """ Discover the properties of nodes in our address book.
+
+            All nodes are asked to describe themselves at once and the replies
+            are awaited for at most request_timeout seconds. Nodes that do not
+            know the command describe are asked for each property separately.
+            A node that does not reply keeps its previous properties.
+        """
 
-                if node_publisher_url not in self.node_publisher_connected:
-                    new_publishers += 1
+        properties = {'metrics': 'get_metric_list',
+                      'data': 'get_data_list',
+                      'topics': 'get_topic_list',
+                      'publisher': 'get_publisher'}
+
+        nodes = [node for node in self.node_addresses if node]
+        replies = self.node_request_many('command',
+                                         dict.fromkeys(nodes, 'describe'))
+
+        descriptions = {}
+        old_nodes = []
+        for node, reply in replies.items():
+            if 'reply' in reply:
+                description = json.loads(reply['reply'][0].bytes)
+                if isinstance(description, dict):
+                    descriptions[node] = description
+                else:
+                    old_nodes.append(node)
+
+        for name, command in properties.items():
+            if not old_nodes:
+                break
+            replies = self.node_request_many('command',
+                                             dict.fromkeys(old_nodes, command))
+            for node in list(old_nodes):
+                if 'reply' in replies[node]:
+                    descriptions.setdefault(node, {})[name] = \
+                        json.loads(replies[node]['reply'][0].bytes)
+                else:
+                    old_nodes.remove(node)
+                    descriptions.pop(node, None)
 
-            self.node_metrics = new_metrics
-            self.node_data = new_data
-            self.node_indices = new_indices
-            self.node_topics = new_topics
-            self.node_publisher_urls = new_publisher_urls
+        new_metrics = {}
+        new_data = {}
+        new_indices = {}
+        new_topics = {}
+        new_publisher_urls = {}
 
-            # signal if there were new publishers
-            if new_publishers > 0:
-                self.new_publisher.setstate(1)
+        for node in nodes:
+            if node in descriptions:
+                description = descriptions[node]
+                new_metrics[node] = description['metrics']
+                new_data[node] = description['data']
+                new_topics[node] = description['topics']
+                new_publisher_urls[node] = description['publisher']
+            elif node in self.node_metrics:
+                new_metrics[node] = self.node_metrics[node]
+                new_data[node] = self.node_data[node]
+                new_topics[node] = self.node_topics[node]
+                new_publisher_urls[node] = self.node_publisher_urls[node]
+
+        self.node_metrics = new_metrics
+        self.node_data = new_data
+        self.node_indices = new_indices
+        self.node_topics = new_topics
+        self.node_publisher_urls = new_publisher_urls
+
+        self.update_publishers()
 
     def format_json(self, data):
         """ Utility function to format json-dumps.
@@ -266,6 +523,25 @@ class Dispatcher():
 
         return result
 
+    def error_response(self, status, message):
+        """ Return an HTTP error response with a JSON body, to be raised in
+            a route.
+        """
+        return bottle.HTTPResponse(body=self.format_json({'error': message}),
+                                   status=status,
+                                   headers={'Content-Type': 'application/json'})
+
+    def binary_requested(self):
+        """ Check if the client wants data in the binary format, either with
+            the query parameter format=binary or with the HTTP header
+            "Accept: application/octet-stream".
+        """
+        if bottle.request.GET.get('format') == 'binary':
+            return True
+
+        accept = bottle.request.headers.get('Accept', '')
+        return 'application/octet-stream' in accept
+
 # =============================================================================
 # Route definitions
 # =============================================================================
@@ -489,10 +765,8 @@ class Dispatcher():
         """
 
         if node in self.node_addresses:
-            socket_tmp = self.context.socket(zmq.REQ)
-            socket_tmp.connect(self.node_addresses[node]['address'])
-            mu.midas_send(socket_tmp, 'command', 'get_nodeinfo')
-            results = socket_tmp.recv()
+            results = self.node_request(node, 'command', 'get_nodeinfo')
+            results = results[0].bytes
         else:
             results = {'error': 'node not available'}
 
@@ -553,19 +827,84 @@ class Dispatcher():
                 "type": "metric_a"
             }
         ]
+
+        @apiErrorExample Node did not reply within request_timeout:
+        HTTP/1.1 504 Gateway Timeout
+        {
+            "error" : "node did not reply within 10.0 s"
+        }
+
+        @apiErrorExample No connection became free within request_timeout:
+        HTTP/1.1 503 Service Unavailable
+        {
+            "error" : "node busy"
+        }
         """
 
         if node in self.node_addresses:
-            socket_tmp = self.context.socket(zmq.REQ)
-            socket_tmp.connect(self.node_addresses[node]['address'])
-
-            mu.midas_send(socket_tmp, 'metric', requests)
-            result = socket_tmp.recv_string()
+            result = self.node_request(node, 'metric', requests)
+            result = result[0].bytes.decode()
 
             return self.pass_json(result)
         else:
             return self.format_json({'error': 'node not available'})
 
+    def get_metric_nodes(self, requests):
+        """
+        @api {get} /metric/:requests Request metrics from multiple nodes
+        @apiGroup Metrics
+        @apiName GetMetricNodes
+        @apiDescription Request metrics from several nodes at once. The
+                        requests are sent to all nodes concurrently and the
+                        replies are returned together, so the response time
+                        is that of the slowest node.
+
+        @apiParam {String} requests JSON object with node names as keys and
+        the metric requests of each node as values. The requests of a node
+        are given as for /:nodename/metric/:requests. The reply of each node
+        is returned under "return" with the time in seconds it took to
+        arrive ("latency"), or under "error" if the node did not reply.
+
+        @apiExample Request metric_a from two nodes
+            http 127.0.0.1:8080/metric/'{"example_node_a":{"type":"metric_a"}, "example_node_b":[{"type":"metric_b"}]}'
+
+        @apiSuccessExample Success-Response:
+        HTTP/1.1 200 OK
+        {
+            "example_node_a" : {
+                "latency" : 0.0021,
+                "return" : [
+                    {
+                        "return" : 81.5,
+                        "type" : "metric_a"
+                    }
+                ]
+            },
+            "example_node_b" : {
+                "error" : "node not available"
+            }
+        }
+        """
+
+        try:
+            node_requests = json.loads(requests)
+        except ValueError:
+            node_requests = None
+
+        if not isinstance(node_requests, dict):
+            return self.format_json({'error': 'requests must be a JSON object '
+                                              'of node names and requests'})
+
+        messages = {node: json.dumps(node_requests[node])
+                    for node in node_requests}
+        replies = self.node_request_many('metric', messages)
+
+        for node, reply in replies.items():
+            if 'reply' in reply:
+                reply['return'] = json.loads(reply.pop('reply')[0].bytes)
+
+        return self.format_json(replies)
+
     def get_data(self, node, requests):
         """
         @api {get} /:nodename/data/:requests Request data
@@ -588,12 +927,25 @@ class Dispatcher():
         present time The second number indicates the length of data segment in
         seconds.
 
+        @apiParam {String} format Set to "binary" to receive the data as raw
+        arrays instead of JSON. The binary format can also be requested with
+        the HTTP header "Accept: application/octet-stream". A binary reply
+        starts with the length of a JSON header (uint32, little endian),
+        followed by the header and the samples and time stamps of each
+        channel as raw arrays. The header is the JSON reply with the data of
+        each channel replaced by "n_samples", "dtype" and "time_dtype". The
+        samples are float64 unless the request has the key "dtype" set to
+        "float32". See midas.utilities.unpack_data.
+
         @apiExample Request the past 3 seconds of data from channel Ch1
             http 127.0.0.1:8080/example_node_a/data/'{"channels":["Ch1"], "time_window":[3, 3]}'
 
         @apiExample Request all data from channels Ch1 and Ch2
             http 127.0.0.1:8080/example_node_a/data/'{"channels":["Ch1", "Ch2"]}'
 
+        @apiExample Request data from channel Ch1 as raw float32 arrays
+            http 127.0.0.1:8080/example_node_a/data/'{"channels":["Ch1"], "dtype":"float32"}'?format=binary
+
 
         @apiSuccessExample Success-Response:
         HTTP/1.1 200 OK
@@ -634,15 +986,110 @@ class Dispatcher():
         """
 
         if node in self.node_addresses:
-            socket_tmp = self.context.socket(zmq.REQ)
-            socket_tmp.connect(self.node_addresses[node]['address'])
+            if self.binary_requested():
+                frames = self.node_request(node, 'data_binary', requests)
+                bottle.response.content_type = 'application/octet-stream'
+                return b''.join(frame.buffer for frame in frames)
 
-            mu.midas_send(socket_tmp, 'data', requests)
-            data = socket_tmp.recv_string()
-            return self.pass_json(data)
+            data = self.node_request(node, 'data', requests)
+            return self.pass_json(data[0].bytes.decode())
         else:
             return self.format_json({node: 'not available'})
 
+    def get_stream(self, node, requests):
+        """
+        @api {get} /:nodename/stream/:requests Stream data
+        @apiGroup Data
+        @apiName GetStream
+        @apiDescription Stream the new samples of channels as they arrive at
+                        the node. The response is sent in chunks and holds
+                        one JSON object per line, each with new samples and
+                        their time stamps (LSL clock) of one channel. Only
+                        samples that arrive after the request are sent, and
+                        each sample is sent once. Empty lines are sent when
+                        there are no new samples. The node must be configured
+                        with run_streamer = True.
+
+        @apiParam {String} nodename The name of the node.
+
+        @apiParam {String} requests JSON-formatted request. Channels can be
+        specified by "channels"-key, followed by a list of channel names. All
+        channels are streamed if "channels" is omitted.
+
+        @apiExample Stream channels Ch1 and Ch2
+            curl -N 127.0.0.1:8080/example_node_a/stream/'{"channels":["Ch1", "Ch2"]}'
+
+        @apiSuccessExample Success-Response:
+        HTTP/1.1 200 OK
+        {"channel": "Ch1", "data": [43.0, 44.0], "time": [1001.41, 1001.42]}
+        {"channel": "Ch2", "data": [12.0, 11.0], "time": [1001.41, 1001.42]}
+
+        @apiErrorExample Dispatcher has max_streams streams open:
+        HTTP/1.1 503 Service Unavailable
+        {
+            "error" : "too many streams"
+        }
+        """
+
+        if node not in self.node_addresses:
+            return self.format_json({node: 'not available'})
+
+        if not self.node_publisher_urls.get(node):
+            return self.format_json({'error': 'node has no publisher'})
+
+        try:
+            channels = json.loads(requests).get('channels')
+        except (ValueError, AttributeError):
+            return self.format_json({'error': 'malformed request'})
+
+        if channels is None:
+            channels = list(self.node_data.get(node, {}))
+
+        bottle.response.content_type = 'application/x-ndjson'
+        return self.stream_samples(node, channels)
+
+    def stream_samples(self, node, channels):
+        """ Subscribe to the samples that a node streams and yield them as
+            lines of JSON.
+
+        Args:
+            node: <str> name of the node
+            channels: <list> names of the channels
+        """
+        # Bottle runs the generator up to the first line before sending the
+        # headers, so the error response can still be sent from here
+        if not self.stream_slots.acquire(blocking=False):
+            raise self.error_response(503, 'too many streams')
+
+        socket = self.context.socket(zmq.SUB)
+        socket.setsockopt(zmq.LINGER, 0)
+        for channel in channels:
+            topic = '{};data/{}'.format(node, channel)
+            socket.setsockopt(zmq.SUBSCRIBE, topic.encode())
+        socket.connect(self.node_publisher_urls[node])
+
+        try:
+            while self.run_state:
+                # an empty line now and then notices closed connections
+                if not socket.poll(1000):
+                    yield '\n'
+                    continue
+
+                _, topic, samples = mu.unpack_payload(
+                    socket.recv_multipart(copy=False))
+
+                # subscriptions match prefixes, e.g., Ch1 matches Ch10
+                channel = topic[len('data/'):]
+                if channel not in channels:
+                    continue
+
+                yield json.dumps({'channel': channel,
+                                  'data': samples[0].tolist(),
+                                  'time': samples[1].tolist()}) + '\n'
+        finally:
+            socket.close()
+            self.stream_slots.release()
+
     def get_test(self):
         """
         @api {get} /test Test Dispatcher
@@ -691,11 +1138,9 @@ class Dispatcher():
             latencies = []
             for _ in range(int(num)):
                 time_sent = time.time()
-                socket_tmp = self.context.socket(zmq.REQ)
-                socket_tmp.connect(self.node_addresses[node]['address'])
-                mu.midas_send(socket_tmp, 'ping', 'ping')
-                ping = socket_tmp.recv_string()
-                latencies.append(time.time() - time_sent - float(ping))
+                ping = self.node_request(node, 'ping', 'ping')
+                ping = float(ping[0].bytes)
+                latencies.append(time.time() - time_sent - ping)
             return self.format_json({node + "_RTT": latencies})
 
         else:
@@ -722,19 +1167,23 @@ class Dispatcher():
         # control variable for threads
         self.run_state = True
 
-        # start thread handling updating of nodes
-        self.ud = threading.Thread(target=self.update_nodes)
-        self.ud.start()
-
         # start thread running publisher-subscriber proxy
         if self.run_pubsub_proxy:
-            self.psproxy_watchdog = threading.Thread(target=self.pubsub_proxy_watchdog)
-            self.psproxy_watchdog.start()
+            self.psproxy = threading.Thread(target=self.pubsub_proxy)
+            self.psproxy.start()
+
+        # start listening to the nodes and the thread updating their
+        # properties
+        self.registry.start()
+        self.ud = threading.Thread(target=self.update_nodes)
+        self.ud.start()
 
         # Connect routes
         bottle.route('/', method="GET")(self.root)
         bottle.route('/<node>/metric/<requests>', method="GET")(self.get_metric)
         bottle.route('/<node>/data/<requests>', method="GET")(self.get_data)
+        bottle.route('/<node>/stream/<requests>', method="GET")(self.get_stream)
+        bottle.route('/metric/<requests>', method="GET")(self.get_metric_nodes)
 
         # Status request routes
         bottle.route('/status/nodes', method="GET")(self.status_nodes)
@@ -761,21 +1210,32 @@ class Dispatcher():
         self.ui = threading.Thread(target=self.show_ui)
         self.ui.start()
 
-        # Start the web server
-        app = bottle.default_app()
-        waitress.serve(app,
-                       host=self.ip,
-                       port=self.port,
-                       threads=self.n_threads)
+        # Start the web server. The asyncio server serves the same routes
+        # from an event loop, the threads of waitress are not needed.
+        if self.server == 'asyncio':
+            from .async_dispatcher import AsyncServer
+            AsyncServer(self).serve(self.ip, self.port)
+        else:
+            app = bottle.default_app()
+            waitress.serve(app,
+                           host=self.ip,
+                           port=self.port,
+                           threads=self.n_threads)
 
     def stop(self):
         print("Stopping dispatcher")
         self.run_state = False
 
+        self.registry.stop()
+        self.nodes_changed.set()
         self.ud.join()
 
         if self.run_pubsub_proxy:
-            self.psproxy_watchdog.join()
+            socket_control = self.context.socket(zmq.PUSH)
+            socket_control.connect(self.url_proxy_control)
+            socket_control.send_multipart([b'stop', b''])
+            socket_control.close()
+            self.psproxy.join()
 
         os._exit(1)
 
@@ -15,8 +15,11 @@ import sys
 import zmq
 import time
 import json
+import queue
 import inspect
+import numpy as np
 import multiprocessing as mp
+from concurrent.futures import ThreadPoolExecutor
 from . import utilities as mu
 import pylsl as lsl
 
@@ -37,13 +40,27 @@ class BaseNode(object):
                  port_backend=5002,
                  port_publisher='',
                  n_responders=5,
+                 broker_mode='lru',
                  lsl_stream_name=None,
                  primary_n_channels=None,
                  primary_channel_names=[],
                  primary_channel_descriptions=None,
                  primary_sampling_rate=None,
                  primary_buffer_size_s=30,
+                 primary_chunk_size=1,
+                 primary_chunk_timeout=0.05,
                  run_publisher=False,
+                 publisher_queue_size=1000,
+                 publisher_hwm=1000,
+                 run_streamer=False,
+                 stream_interval=0.1,
+                 metric_cache_size=128,
+                 metric_cache_default=False,
+                 metric_coalesce=True,
+                 metric_wait_timeout=10.0,
+                 incremental_interval=0.05,
+                 schedule=None,
+                 metric_threads=1,
                  secondary_node=False,
                  secondary_n_channels=0,
                  secondary_buffer_size=0,
@@ -89,9 +106,48 @@ class BaseNode(object):
             if 'run_publisher' in config:
                 run_publisher = mu.str2bool(config['run_publisher'])
 
+            if 'publisher_queue_size' in config:
+                publisher_queue_size = int(config['publisher_queue_size'])
+
+            if 'publisher_hwm' in config:
+                publisher_hwm = int(config['publisher_hwm'])
+
+            if 'run_streamer' in config:
+                run_streamer = mu.str2bool(config['run_streamer'])
+
+            if 'stream_interval' in config:
+                stream_interval = float(config['stream_interval'])
+
+            if 'metric_cache_size' in config:
+                metric_cache_size = int(config['metric_cache_size'])
+
+            if 'metric_cache_default' in config:
+                metric_cache_default = mu.str2bool(config['metric_cache_default'])
+
+            if 'metric_coalesce' in config:
+                metric_coalesce = mu.str2bool(config['metric_coalesce'])
+
+            if 'metric_wait_timeout' in config:
+                metric_wait_timeout = float(config['metric_wait_timeout'])
+
+            if 'incremental_interval' in config:
+                incremental_interval = float(config['incremental_interval'])
+
+            if 'metric_threads' in config:
+                metric_threads = int(config['metric_threads'])
+
+            if 'schedule' in config:
+                schedule = {}
+                for job in mu.listify(config, 'schedule'):
+                    name, interval = job.split(':')
+                    schedule[name.strip()] = float(interval)
+
             if 'n_responders' in config:
                 n_responders = int(config['n_responders'])
 
+            if 'broker_mode' in config:
+                broker_mode = config['broker_mode'].lower().strip()
+
             # Settings for data stream properties
             if 'lsl_stream_name' in config:
                 lsl_stream_name = config['lsl_stream_name']
@@ -111,6 +167,12 @@ class BaseNode(object):
             if 'primary_buffer_size_s' in config:
                 primary_buffer_size_s = float(config['primary_buffer_size_s'])
 
+            if 'primary_chunk_size' in config:
+                primary_chunk_size = int(config['primary_chunk_size'])
+
+            if 'primary_chunk_timeout' in config:
+                primary_chunk_timeout = float(config['primary_chunk_timeout'])
+
             # Settings for secondary channels
             if 'secondary_node' in config:
                 secondary_node = config['secondary_node']
@@ -140,6 +202,12 @@ class BaseNode(object):
         self.run_publisher = run_publisher
         self.n_responders = n_responders
 
+        # The LRU broker hands requests to the least recently used responder,
+        # the proxy broker distributes them round-robin with less overhead
+        if broker_mode not in ['lru', 'proxy']:
+            raise ValueError("broker_mode must be 'lru' or 'proxy'")
+        self.broker_mode = broker_mode
+
         # Automatically determine the IP of the node unless set in the node
         # configuration
         if (ip is None) or (ip == 'auto'):
@@ -156,10 +224,55 @@ class BaseNode(object):
 
         if self.run_publisher:
             self.url_publisher = 'tcp://{}:{}'.format(self.ip, self.port_publisher)
-            self.message_queue = mp.Queue(10)
+            self.message_queue = mp.Queue(publisher_queue_size)
         else:
             self.url_publisher = ''
 
+        # messages waiting in the queue and in the socket for each subscriber
+        self.publisher_queue_size = publisher_queue_size
+        self.publisher_hwm = publisher_hwm
+
+        # number of messages published, messages publish() rejected because
+        # the queue was full, and times the publisher found the queue full
+        self.publisher_published = mp.Value('L', 0)
+        self.publisher_dropped = mp.Value('L', 0)
+        self.publisher_queue_full = mp.Value('L', 0)
+
+        # the streamer publishes new samples of all channels
+        if run_streamer and not self.run_publisher:
+            raise ValueError('run_streamer requires run_publisher')
+        self.run_streamer = run_streamer
+        self.stream_interval = stream_interval
+
+        # Results of metrics are cached by their request and the number of
+        # samples in the buffers, the cache is created when the node starts.
+        # Metrics are cached if metric_cache_default is True, unless chosen
+        # otherwise with the decorator utilities.metric_cache.
+        self.metric_cache_size = metric_cache_size
+        self.metric_cache_default = metric_cache_default
+        self.metric_cache = None
+        self.cache_manager = None
+        self.incremental_values = None
+
+        # Identical metric requests in flight at several responders are
+        # calculated once, the others wait at most metric_wait_timeout
+        # seconds for the result (see utilities.SingleFlight)
+        self.metric_coalesce = metric_coalesce
+        self.metric_wait_timeout = metric_wait_timeout
+        self.metric_flights = None
+
+        # The receiver updates the incremental metrics with the new samples
+        # and shares their values every incremental_interval seconds
+        self.incremental_interval = incremental_interval
+
+        # Threads calculating the metrics of a request in each responder
+        self.metric_threads = metric_threads
+        self.metric_executor = None
+
+        # Intervals (in seconds) of scheduled metrics by name, overriding the
+        # intervals given with the decorator utilities.schedule
+        self.schedule = schedule or {}
+
         # primary channels and data stream properties
         if self.primary_node:
             self.initialize_primary(lsl_stream_name,
@@ -167,7 +280,9 @@ class BaseNode(object):
                                     primary_channel_names,
                                     primary_buffer_size_s,
                                     primary_sampling_rate,
-                                    primary_channel_descriptions)
+                                    primary_channel_descriptions,
+                                    primary_chunk_size,
+                                    primary_chunk_timeout)
         else:
             self.primary_n_channels = 0
             self.primary_buffer_size = 0
@@ -185,12 +300,14 @@ class BaseNode(object):
             self.secondary_buffer_size = 0
             self.secondary_channel_names = []
             self.secondary_channel_descriptions = []
+            self.secondary_buffers = []
 
         # ------------------------------
         # State variables:
         #    run_state      : poison pill to control processes
-        #    primary_lock   : lock for channel_data (primary data)
-        #    secondary_lock : lock for the secondary channel_data
+        #    primary_lock   : lock of the primary buffer (not needed for
+        #                     reading, the buffer uses a sequence counter)
+        #    secondary_lock : locks of the secondary buffers
         # ------------------------------
         self.run_state = mp.Value('i', 0)
 
@@ -211,11 +328,23 @@ class BaseNode(object):
         # ------------------------------
         self.metric_functions = []
 
+        # ------------------------------
+        # Empty container for incremental metrics, which are updated by the
+        # receiver (see utilities.IncrementalMetric)
+        # ------------------------------
+        self.incremental_metrics = []
+        self.incremental_count = 0
+
     def initialize_primary(self, lsl_stream_name, primary_n_channels,
                            primary_channel_names, primary_buffer_size_s,
-                           primary_sampling_rate, primary_channel_descriptions):
+                           primary_sampling_rate, primary_channel_descriptions,
+                           primary_chunk_size=1, primary_chunk_timeout=0.05):
         """ Initialize primary LSL stream properties and allocate memory for
             storing the data.
+
+            If primary_chunk_size is larger than one the receiver pulls chunks
+            of at most primary_chunk_size samples from the LSL inlet, waiting
+            at most primary_chunk_timeout seconds for a chunk to fill up.
         """
 
         # Initialize stream properties
@@ -239,19 +368,19 @@ class BaseNode(object):
         else:
             self.primary_channel_descriptions = primary_channel_descriptions
 
-        self.primary_last_sample_received = mp.Value('d', time.time())
-
-        # Preallocate primary buffers
-        self.primary_channel_data = [0] * self.primary_n_channels
-        for i in range(self.primary_n_channels):
-            self.primary_channel_data[i] = mp.Array('d', [0] * self.primary_buffer_size)
-        self.primary_time_array = mp.Array('d', [0] * self.primary_buffer_size)
-        self.primary_last_time = mp.Array('d', [0])
+        # Chunks can never be larger than the circular buffer
+        self.primary_chunk_size = max(1, min(primary_chunk_size,
+                                             self.primary_buffer_size))
+        self.primary_chunk_timeout = primary_chunk_timeout
 
-        self.primary_wptr = mp.Value('i', 0)
-        self.primary_buffer_full = mp.Value('i', 0)
+        self.primary_last_sample_received = mp.Value('d', time.time())
 
-        self.primary_lock = mp.Lock()
+        # Preallocate the primary buffer in shared memory. The receiver is
+        # the only writer and readers use the sequence counter of the buffer,
+        # so the primary lock is not needed to access the data.
+        self.primary_buffer = mu.RingBuffer(self.primary_n_channels,
+                                            self.primary_buffer_size)
+        self.primary_lock = self.primary_buffer.lock
 
     def initialize_secondary(self, n_channels, buffer_size,
                              channel_names, channel_descriptions):
@@ -274,22 +403,9 @@ class BaseNode(object):
         if not self.secondary_channel_descriptions:
             self.secondary_channel_descriptions = [''] * self.secondary_n_channels
 
-        # Preallocate secondary buffers
-        self.secondary_channel_data = [0] * self.secondary_n_channels
-        self.secondary_time_array = [0] * self.secondary_n_channels
-        self.secondary_last_time = mp.Array('d', [0] * self.secondary_n_channels)
-
-        for idx, size in enumerate(self.secondary_buffer_size):
-            self.secondary_channel_data[idx] = mp.Array('d', [0] * size)
-            self.secondary_time_array[idx] = mp.Array('d', [0] * size)
-
-        self.secondary_wptr = mp.Array('i', [0] * self.secondary_n_channels)
-        self.secondary_buffer_full = mp.Array('i', [0] * self.secondary_n_channels)
-
-        self.secondary_lock = []
-
-        for i in range(self.secondary_n_channels):
-            self.secondary_lock.append(mp.Lock())
+        # Preallocate secondary buffers in shared memory, one per channel
+        self.secondary_buffers = [mu.RingBuffer(1, size) for size in self.secondary_buffer_size]
+        self.secondary_lock = [buf.lock for buf in self.secondary_buffers]
 
     def receiver(self):
         """ Receive data from an LSL stream and store it in a circular
@@ -307,49 +423,353 @@ class BaseNode(object):
         inlet = lsl.StreamInlet(streams[0], max_buflen=1)
         print("\tDone")
 
-        i = 0
-        self.primary_last_time.value = 0  # init the last_time value
+        if self.primary_chunk_size > 1:
+            self.receive_chunks(inlet)
+        else:
+            self.receive_samples(inlet)
+
+        # Ending run, clear inlet
+        inlet.close_stream()
+
+    def receive_samples(self, inlet):
+        """ Pull samples one at a time from an LSL inlet and store them in the
+            primary circular buffer.
+        """
+
+        t_update = time.time()
+
         while self.run_state.value:
             x, t = inlet.pull_sample()
-            self.primary_last_sample_received.value = time.time()
+            now = time.time()
+            self.primary_last_sample_received.value = now
 
-            self.primary_lock.acquire()  # LOCK-ON
+            if t is None:
+                t = self.primary_buffer.last_time + self.primary_sampling_rate
 
-            for k in range(self.primary_n_channels):
-                self.primary_channel_data[k][self.primary_wptr.value] = x[k]
+            self.primary_buffer.push(x, t)
 
-            if t is None:
-                t = self.primary_last_time.value + self.primary_sampling_rate
+            if self.incremental_metrics and now >= t_update:
+                self.update_incremental_metrics()
+                t_update = now + self.incremental_interval
 
-            self.primary_time_array[self.primary_wptr.value] = t
-            self.primary_last_time.value = t
+    def receive_chunks(self, inlet):
+        """ Pull chunks of samples from an LSL inlet into a preallocated buffer
+            and store each chunk in the primary circular buffer as one write.
+        """
 
-            i += 1
-            self.primary_wptr.value = i % self.primary_buffer_size
-            self.primary_lock.release()  # LOCK-OFF
+        chunk = np.zeros((self.primary_chunk_size, self.primary_n_channels),
+                         dtype=np.dtype(inlet.value_type))
 
-            # is the buffer full
-            if (0 == self.primary_buffer_full.value) and (i >= self.primary_buffer_size):
-                self.primary_buffer_full.value = 1
-        # Ending run, clear inlet
-        inlet.close_stream()
+        t_update = time.time()
+
+        while self.run_state.value:
+            _, t = inlet.pull_chunk(timeout=self.primary_chunk_timeout,
+                                    max_samples=self.primary_chunk_size,
+                                    dest_obj=chunk)
+            n = len(t)
+            if n == 0:
+                continue
+            now = time.time()
+            self.primary_last_sample_received.value = now
+
+            self.primary_buffer.write(chunk[:n], t)
+
+            if self.incremental_metrics and now >= t_update:
+                self.update_incremental_metrics()
+                t_update = now + self.incremental_interval
+
+    def update_incremental_metrics(self):
+        """ Update the incremental metrics with the primary samples received
+            since the last update and share their values with the responders.
+
+            The receiver calls this at most every incremental_interval
+            seconds, so the metrics are updated with blocks of samples and
+            the values are sent to the responders once per block. A metric
+            that raises an exception gets a MetricError as its value, and
+            the other metrics and the receiver carry on.
+        """
+        self.incremental_count, data, times = \
+            self.primary_buffer.read_since(self.incremental_count)
+        if len(times) == 0:
+            return
+
+        data = data.T
+        values = {}
+        for metric, columns in zip(self.incremental_metrics,
+                                   self.incremental_columns):
+            try:
+                metric.update(data[:, columns], times)
+                values[metric.name] = metric.value()
+            except Exception as e:
+                # A failing metric must not take down the receiver
+                values[metric.name] = mu.MetricError(
+                    'Metric failed: {}: {}'.format(type(e).__name__, e))
+
+        self.incremental_values.update(values)
 
     def publisher(self):
         """ Publish data using ZeroMQ.
 
             A message to be published is placed in the node's message queue
             (self.message_queue), from which this functions gets() the next
-            message and publishes it using the node's publisher.
+            message and publishes it using the node's publisher. The
+            publisher is bound to url_publisher, where the dispatcher (or any
+            subscriber) connects.
+
+            The publisher waits for a message and then publishes all messages
+            in the queue at once. Messages queued with publish are sent as
+            three frames: 'node_name;topic', a header and the payload (see
+            utilities.pack_payload). Other messages (str or bytes) are sent
+            as two frames, the name of the node and the message.
+
+            Every subscriber has its own high-water mark (publisher_hwm). A
+            subscriber that is too slow loses the messages beyond its
+            high-water mark without affecting the other subscribers. The
+            publisher does not see these drops; a message queue that is full
+            whenever the publisher reads it (queue_full in
+            get_publisher_stats) is the sign of backpressure.
         """
 
         context = zmq.Context()
-        socket = context.socket(zmq.PUB)
-        socket.connect(self.url_publisher)
+        socket = context.socket(zmq.XPUB)
+        socket.setsockopt(zmq.SNDHWM, self.publisher_hwm)
+        socket.bind(self.url_publisher)
+
+        name = self.node_name.encode()
+
+        while self.run_state.value:
+            try:
+                batch = [self.message_queue.get(timeout=0.1)]
+            except queue.Empty:
+                continue
+
+            while len(batch) < self.publisher_queue_size:
+                try:
+                    batch.append(self.message_queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # discard the subscriptions, the socket keeps track of them
+            while socket.poll(0):
+                socket.recv()
+
+            for message in batch:
+                if isinstance(message, tuple):
+                    frames = [name + b';' + message[0].encode()]
+                    frames += mu.pack_payload(message[1])
+                elif isinstance(message, str):
+                    frames = [name, message.encode()]
+                else:
+                    frames = [name, message]
+                socket.send_multipart(frames, copy=False)
+
+            with self.publisher_published.get_lock():
+                self.publisher_published.value += len(batch)
+            if len(batch) == self.publisher_queue_size:
+                with self.publisher_queue_full.get_lock():
+                    self.publisher_queue_full.value += 1
+
+        socket.close(linger=0)
+        context.term()
+
+    def publish(self, topic, data, block=True):
+        """ Publish data on a topic. Subscribers receive the data with
+            utilities.unpack_payload and can subscribe to the prefix
+            'node_name;topic' (or 'node_name;' for all topics of the node).
+            Plain str or bytes messages put in the message queue are sent
+            with the frame 'node_name' instead, so the prefix 'node_name'
+            receives both. Raises RuntimeError if the node was created
+            without run_publisher.
+
+        Args:
+            topic: <str> the topic, e.g., listed in topic_list
+            data: NumPy array (sent as raw binary) or JSON serializable object
+            block: <bool> wait if the message queue is full
+        Returns:
+            queued: <bool> False if the queue was full and block is False
+        """
+        if not self.run_publisher:
+            raise RuntimeError('Node {} has no publisher, set run_publisher '
+                               'to publish'.format(self.node_name))
+
+        try:
+            self.message_queue.put((topic, data), block)
+        except queue.Full:
+            with self.publisher_dropped.get_lock():
+                self.publisher_dropped.value += 1
+            return False
+        return True
+
+    def streamer(self):
+        """ Publish the new samples of all channels every stream_interval
+            seconds.
+
+            The streamer keeps a cursor (the number of samples read) for
+            every buffer and publishes only the samples that the receiver or
+            push_sample_secondary have written after the cursor. The samples
+            of each channel are published on the topic 'data/<channel name>'
+            as a 2 x n array holding the samples and their time stamps.
+        """
+
+        buffers = []
+        if self.primary_node:
+            buffers.append((self.primary_buffer, self.primary_channel_names))
+        for buf, name in zip(self.secondary_buffers,
+                             self.secondary_channel_names):
+            buffers.append((buf, [name]))
+
+        cursors = [buf.count for buf, _ in buffers]
+
+        t_next = time.time()
+        while self.run_state.value:
+            t_next += self.stream_interval
+            time.sleep(max(0, t_next - time.time()))
+
+            for i, (buf, channel_names) in enumerate(buffers):
+                cursors[i], data, times = buf.read_since(cursors[i])
+                if len(times) == 0:
+                    continue
+                for row, name in enumerate(channel_names):
+                    self.publish('data/' + name, np.vstack((data[row], times)))
+
+    def scheduler(self):
+        """ Evaluate the scheduled metrics at their intervals.
+
+            Each job runs at fixed times (start + n * interval), so the
+            intervals do not drift with the time the jobs take. A job that
+            is still running at its next start time has overrun: the missed
+            runs are skipped and counted, see get_scheduler_stats. The jobs
+            run one at a time, so a slow job delays the others.
+
+            The result of a job is pushed into its secondary channels (one
+            value per channel) and/or published on its topic. A job that
+            fails, or returns values that do not fit its secondary channels,
+            is counted as a failure and the scheduler carries on.
+        """
+
+        t_start = time.time()
+        t_next = [t_start + job['interval'] for job in self.scheduled_jobs]
 
         while self.run_state.value:
-            if not self.message_queue.empty():
-                socket.send_string('{};{}'.format(self.node_name, self.message_queue.get()))
-            time.sleep(0.0001)
+            i = int(np.argmin(t_next))
+            job = self.scheduled_jobs[i]
+
+            # Sleep in short steps to notice when the node is stopped
+            delay = t_next[i] - time.time()
+            if delay > 0:
+                time.sleep(min(delay, 0.1))
+                continue
+
+            t = time.time()
+            try:
+                self.output_job(job, self.run_job(job))
+                failed = 0
+            except Exception as e:
+                print('Scheduled metric {} failed: {}'.format(job['name'], e))
+                failed = 1
+            duration = time.time() - t
+
+            t_next[i] += job['interval']
+            overruns = 0
+            if t_next[i] < time.time():
+                overruns = int((time.time() - t_next[i]) // job['interval']) + 1
+                t_next[i] += overruns * job['interval']
+
+            stats = self.scheduler_stats[i]
+            with stats.get_lock():
+                stats[0] += 1
+                stats[1] += overruns
+                stats[2] = duration
+                stats[3] = max(stats[3], duration)
+                stats[4] += duration
+                stats[5] += failed
+
+    def run_job(self, job):
+        """ Evaluate a scheduled metric and return the result. """
+        results = {}
+        self.calculate_metrics([job['request']], [0], [None], results)
+        if isinstance(results[0], mu.MetricError):
+            raise RuntimeError(results[0])
+        return results[0]
+
+    def output_job(self, job, result):
+        """ Push the result of a scheduled metric into its secondary channels
+            and/or publish it on its topic.
+
+            The result is checked before anything is pushed: it must be one
+            number per secondary channel.
+        """
+        if job['secondary_channels']:
+            try:
+                values = np.atleast_1d(np.asarray(result, dtype=np.float64))
+            except (TypeError, ValueError):
+                raise ValueError('Scheduled metric {} returned a non-numeric '
+                                 'result'.format(job['name']))
+            if values.ndim != 1 or len(values) != len(job['secondary_channels']):
+                raise ValueError('Scheduled metric {} returned {} values '
+                                 'for {} secondary channels'
+                                 .format(job['name'], values.size,
+                                         len(job['secondary_channels'])))
+            time_stamp = lsl.local_clock()
+            for channel, value in zip(job['secondary_channels'], values):
+                self.push_sample_secondary(
+                    self.secondary_channel_names.index(channel),
+                    time_stamp,
+                    value)
+
+        if job['topic']:
+            self.publish(job['topic'], result)
+
+    def generate_schedule(self):
+        """ Collect the scheduled metrics from the metric functions
+            decorated with utilities.schedule and the intervals in
+            self.schedule.
+        """
+        self.scheduled_jobs = []
+
+        for name in self.metric_names:
+            options = getattr(self.metric_pointers[name], 'midas_schedule', {})
+            if not options and name not in self.schedule:
+                continue
+
+            job = {'name': name,
+                   'interval': self.schedule.get(name, options.get('interval')),
+                   'secondary_channels': options.get('secondary_channels') or [],
+                   'topic': options.get('topic')}
+
+            request = {'type': name}
+            for key in ['channels', 'time_window', 'arguments']:
+                if options.get(key) is not None:
+                    request[key] = options[key]
+            job['request'] = request
+
+            # Metrics without outputs are published on their name
+            if not job['secondary_channels'] and not job['topic']:
+                job['topic'] = name
+
+            if not job['interval'] or job['interval'] <= 0:
+                raise ValueError('Scheduled metric {} needs a positive interval'
+                                 .format(name))
+            if not self.is_valid_request(request):
+                raise ValueError('Scheduled metric {} is not a valid request'
+                                 .format(name))
+            if not set(self.secondary_channel_names).issuperset(job['secondary_channels']):
+                raise ValueError('Scheduled metric {} uses unknown secondary '
+                                 'channels'.format(name))
+            if job['topic'] and not self.run_publisher:
+                raise ValueError('Scheduled metric {} requires run_publisher'
+                                 .format(name))
+
+            self.scheduled_jobs.append(job)
+
+        unknown = set(self.schedule) - set(self.metric_names)
+        if unknown:
+            raise ValueError('Scheduled metrics {} not found'
+                             .format(', '.join(sorted(unknown))))
+
+        # runs, overruns, last, maximum and total duration and failures of
+        # each job
+        self.scheduler_stats = [mp.Array('d', 6) for _ in self.scheduled_jobs]
 
     def responder(self, responder_id):
         """ Respond to queries over ZeroMQ.
@@ -361,9 +781,13 @@ class BaseNode(object):
         """
 
         context = zmq.Context()
-        socket = context.socket(zmq.REQ)
-        socket.connect(self.url_backend)
-        socket.send(b"READY")
+        if self.broker_mode == 'proxy':
+            socket = context.socket(zmq.REP)
+            socket.connect(self.url_backend)
+        else:
+            socket = context.socket(zmq.REQ)
+            socket.connect(self.url_backend)
+            socket.send(b"READY")
 
         print('Started new responder.\tID: ' + str(responder_id))
 
@@ -378,6 +802,9 @@ class BaseNode(object):
                 elif req_type == 'data':
                     return_value = self.handle_data(request)
 
+                elif req_type == 'data_binary':
+                    return_value = self.handle_data(request, binary=True)
+
                 elif req_type == 'command':
                     return_value = self.handle_command(request)
 
@@ -385,7 +812,7 @@ class BaseNode(object):
                     return_value = str(time.time() - recv_time)
 
                 else:
-                    return_value = {"error": "not recognized"}
+                    return_value = json.dumps({"error": "not recognized"})
 
                 mu.midas_send(socket, 'reply', return_value, address)
 
@@ -393,31 +820,28 @@ class BaseNode(object):
                 return
 
     def unwrap_channel(self, channel_name):
-        """ Gives the unwrapping vector for the specified channel
+        """ Gives the unwrapping slices for the specified channel
 
         Args:
             channel_name <string>: name of the channel
         Returns:
-            idx <list>: unwrapping vector
+            segments <list>: at most two slices giving the samples in the
+                             buffer in chronological order
         """
-        if channel_name in self.primary_channel_names:
-            if self.primary_buffer_full.value:
-                idx = [0] * self.primary_buffer_size
-                for i in range(self.primary_buffer_size):
-                    idx[i] = (self.primary_wptr.value + i) % self.primary_buffer_size
-            else:
-                idx = range(self.primary_wptr.value)
+        return self.get_buffer(channel_name).segments()
 
-        elif channel_name in self.secondary_channel_names:
-            ch_idx = self.secondary_channel_names.index(channel_name)
-            if self.secondary_buffer_full[ch_idx]:
-                idx = [0] * self.secondary_buffer_size[ch_idx]
-                for i in range(self.secondary_buffer_size[ch_idx]):
-                    idx[i] = (self.secondary_wptr[ch_idx] + i) % self.secondary_buffer_size[ch_idx]
-            else:
-                idx = range(self.secondary_wptr[ch_idx])
+    def get_buffer(self, channel_name):
+        """ Returns the ring buffer holding the specified channel
 
-        return idx
+        Args:
+            channel_name <string>: name of the channel
+        Returns:
+            buf <RingBuffer>: the buffer of the channel
+        """
+        if channel_name in self.primary_channel_names:
+            return self.primary_buffer
+        elif channel_name in self.secondary_channel_names:
+            return self.secondary_buffers[self.secondary_channel_names.index(channel_name)]
 
     def push_sample_secondary(self, ch, timep, value, use_lock=True):
         """ Push a new sample into a secondary data buffer.
@@ -428,18 +852,10 @@ class BaseNode(object):
             value: <float>  value of new sample
         """
         if use_lock:
-            self.secondary_lock[ch].acquire()
-
-        self.secondary_channel_data[ch][self.secondary_wptr[ch]] = value
-        self.secondary_time_array[ch][self.secondary_wptr[ch]] = timep
-        self.secondary_wptr[ch] += 1
-
-        if 0 == self.secondary_buffer_full[ch] and self.secondary_wptr[ch] >= self.secondary_buffer_size[ch]:
-            self.secondary_buffer_full[ch] = 1
-
-        self.secondary_wptr[ch] = self.secondary_wptr[ch] % self.secondary_buffer_size[ch]
-        if use_lock:
-            self.secondary_lock[ch].release()
+            with self.secondary_lock[ch]:
+                self.secondary_buffers[ch].push([value], timep)
+        else:
+            self.secondary_buffers[ch].push([value], timep)
 
     def push_chunk_secondary(self, ch, timeps, values):
         """ Push a chunk of new samples into a secondary data buffer.
@@ -450,10 +866,13 @@ class BaseNode(object):
             values: <list>  list of new values
         """
 
-        self.secondary_lock[ch].acquire()
-        for t, v in zip(timeps, values):
-            self.push_sample_secondary(ch, t, v, use_lock=False)
-        self.secondary_lock[ch].release()
+        values = np.asarray(values, dtype=np.float64).reshape(-1, 1)
+        if len(timeps) != len(values):
+            raise ValueError('Got {} time stamps for {} values'
+                             .format(len(timeps), len(values)))
+
+        with self.secondary_lock[ch]:
+            self.secondary_buffers[ch].write(values, timeps)
 
     def is_valid_request(self, request):
         """ Asserts that the given request is valid.
@@ -469,6 +888,7 @@ class BaseNode(object):
         arguments_ok = True
         channels_ok = True
         time_ok = True
+        dtype_ok = True
 
         if 'type' in request:
             metric_ok = request['type'] in self.metric_names
@@ -476,7 +896,7 @@ class BaseNode(object):
         if 'arguments' in request:
             try:
                 n = inspect.ismethod(self.metric_pointers[request['type']]) + 1
-                fun = inspect.getargspec(self.metric_pointers[request['type']])
+                fun = inspect.getfullargspec(self.metric_pointers[request['type']])
                 arguments_ok = len(request['arguments']) <= len(fun.args) - n
             except:
                 arguments_ok = False
@@ -493,7 +913,10 @@ class BaseNode(object):
             except:
                 time_ok = False
 
-        return metric_ok and arguments_ok and channels_ok and time_ok
+        if 'dtype' in request:
+            dtype_ok = request['dtype'] in ['float32', 'float64']
+
+        return metric_ok and arguments_ok and channels_ok and time_ok and dtype_ok
 
     def get_channel_list(self, requests):
         """ Returns an intersection of requested channels and existing channels.
@@ -509,31 +932,61 @@ class BaseNode(object):
                 channels.extend(request['channels'])
         return list(set.intersection(set(channels), set(self.primary_channel_names + self.secondary_channel_names)))
 
+    def get_time_span(self, requests):
+        """ Returns the time span needed to serve all given requests.
+
+        Args:
+            requests <list>: list of requests
+        Returns:
+            time_span <float>: time (in seconds before the latest sample)
+                               covering the union of the requested
+                               time-windows, None if the whole buffer is needed
+        """
+        time_span = 0
+        for request in requests:
+            if not self.is_valid_request(request):
+                continue
+            if not request.get('time_window'):
+                return None
+            start = request['time_window'][0]
+            if start < 0:
+                return None
+            time_span = max(time_span, start)
+        return time_span
+
     def get_data_from_channel(self, channel_name):
         """ Copy and unwrap data from specified channel
 
         Args:
             channel_name <string>: name of the channel
         Returns:
-            data <list> array of samples
-            times <list> array of timestamps
+            data <array> array of samples
+            times <array> array of timestamps relative to the latest sample
         """
         if channel_name in self.primary_channel_names:
-            time_array = self.primary_time_array[:]
-            data = self.primary_channel_data[self.primary_channel_names.index(channel_name)][:]
+            rows = [self.primary_channel_names.index(channel_name)]
+        else:
+            rows = [0]
 
-        elif channel_name in self.secondary_channel_names:
-            idx = self.secondary_channel_names.index(channel_name)
-            time_array = self.secondary_time_array[idx][:]
-            data = self.secondary_channel_data[idx][:]
+        data, time_array = self.get_buffer(channel_name).read(rows)
 
-        unwrap_idx = self.unwrap_channel(channel_name)
+        return data[0], self.relative_time(time_array)
 
-        time_array = [time_array[i] for i in unwrap_idx]
-        time_array = [abs(i - time_array[-1]) for i in time_array]
-        data = [data[i] for i in unwrap_idx]
+    def relative_time(self, time_array, last_time=None):
+        """ Convert time stamps into time (in seconds) before the latest one
 
-        return data, time_array
+        Args:
+            time_array <array>: time stamps in chronological order
+            last_time <float>: time stamp of the latest sample (defaults to
+                               the last element of time_array)
+        Returns:
+            times <array>: time relative to the latest time stamp
+        """
+        if last_time is None:
+            if len(time_array) == 0:
+                return time_array
+            last_time = time_array[-1]
+        return np.abs(time_array - last_time)
 
     def lock_all_secondary(self):
         """ Locks all channels of the secondary buffer. """
@@ -543,60 +996,85 @@ class BaseNode(object):
         """ Releases all channels of the secondary buffer. """
         [lock.release() for lock in self.secondary_lock]
 
-    def snapshot_data(self, channels):
+    def snapshot_data(self, channels, time_span=None):
         """ Copies specified data channels.
 
+            Only the buffers of the requested channels are read. Readers do
+            not lock the buffers (see RingBuffer.read).
+
         Args:
             channels <list>: list of channels
+            time_span <float>: only copy data at most this many seconds older
+                               than the latest sample of each channel
+                               (default: copy the whole buffer)
         Returns:
-            snapshot <dict>: data and times for each channel
+            snapshot <dict>: data and (raw) time stamps for each channel
         """
-        if self.primary_node:
-            self.primary_lock.acquire()
-
-        if self.secondary_node:
-            self.lock_all_secondary()
-
         snapshot = {}
-        for channel in channels:
-            data, time = self.get_data_from_channel(channel)
-            snapshot[channel] = (data, time)
 
-        if self.primary_node:
-            self.primary_lock.release()
+        # Primary channels share the unwrapping and the time stamps
+        primary = [ch for ch in channels if ch in self.primary_channel_names]
+        if primary:
+            rows = [self.primary_channel_names.index(ch) for ch in primary]
+            data, time_array = self.primary_buffer.read(rows, time_span)
+            for channel, channel_data in zip(primary, data):
+                snapshot[channel] = (channel_data, time_array)
 
-        if self.secondary_node:
-            self.release_all_secondary()
+        for channel in channels:
+            if channel in self.secondary_channel_names:
+                data, time_array = self.get_buffer(channel).read(span=time_span)
+                snapshot[channel] = (data[0], time_array)
 
         return snapshot
 
     def unpack_snapshot(self, snapshot, channels, time_window):
         """ Extracts speciefied channels and time-windows from a snapshot
 
+            The time-window is located by bisection of the time stamps, and
+            only the extracted samples are converted to relative time.
+
         Args:
             snapshot <dict> a snapshot of data
             channels <list> list of channels
             time_window <list> two-element list specifying the time-window
+        Returns:
+            data <list> samples of each channel
+            times <list> time (in seconds) before the latest sample of each
+                         channel
         """
         times = []
         data = []
         if time_window:
             if len(time_window) == 1:
-                time_window = [time_window[0], time_window[0]]
-            time_window[1] = time_window[0] - time_window[1]
+                time_window = [time_window[0], 0]
+            else:
+                time_window = [time_window[0], time_window[0] - time_window[1]]
         for channel in map(snapshot.get, channels):
+            channel_data, time_array = channel[0], channel[1]
+            if len(time_array) == 0:
+                data.append(channel_data)
+                times.append(time_array)
+                continue
+
+            last_time = time_array[-1]
             if time_window:
-                start, stop = mu.find_range(channel[1], time_window)
-                data.append(channel[0][start:stop])
-                times.append(channel[1][start:stop])
-            else:
-                data.append(channel[0])
-                times.append(channel[1])
+                start, stop = mu.find_range(time_array, time_window)
+                channel_data = channel_data[start:stop]
+                time_array = time_array[start:stop]
+            data.append(channel_data)
+            times.append(self.relative_time(time_array, last_time))
         return data, times
 
     def handle_metric(self, requests):
         """ Function for processing incoming metric requests
 
+            Results of cacheable metrics are looked up in the metric cache
+            first, and the data are only copied for the requests that are
+            not found. Identical requests (same metric, channels,
+            time-window and arguments) arriving at several responders at
+            once are calculated only once: the first responder claims the
+            request and the others wait for its result.
+
         Args:
             requests: JSON-formatted request or a list of multiple metric
                       requests
@@ -614,63 +1092,256 @@ class BaseNode(object):
             requests = [requests]
 
         channels = self.get_channel_list(requests)
-        snapshot = self.snapshot_data(channels)
 
-        results = []
-        for request in requests:
-            if 'type' in request and self.is_valid_request(request):
+        # Look up the cached results and claim the requests that are not
+        # being calculated by other responders
+        keys = [None] * len(requests)
+        tickets = {}
+        results = {}
+        claimed = []
+        pending = []
+        if self.metric_cache is not None:
+            counts = self.get_buffer_counts(channels)
+        for i, request in enumerate(requests):
+            if 'type' not in request or not self.is_valid_request(request):
+                continue
+
+            if self.metric_cache is not None:
+                keys[i] = self.metric_cache_key(request, counts)
+                if keys[i] is not None:
+                    hit, result = self.metric_cache.get(keys[i])
+                    if hit:
+                        results[i] = result
+                        continue
+
+            if self.metric_flights is not None:
+                state, ticket = self.metric_flights.claim(
+                    self.metric_flight_key(request))
+                if state == 'claimed':
+                    tickets[i] = ticket
+                    claimed.append(i)
+                elif state == 'pending':
+                    tickets[i] = ticket
+                    pending.append(i)
 
-                if 'time_window' in request:
-                    time_window = request['time_window']
+        try:
+            self.calculate_metrics(requests,
+                                   [i for i in range(len(requests))
+                                    if i not in results and i not in pending],
+                                   keys,
+                                   results)
+        finally:
+            # Share the results, and let the other responders calculate the
+            # requests that were not calculated
+            for i in claimed:
+                if i in results:
+                    self.metric_flights.finish(tickets[i], results[i])
                 else:
-                    time_window = None
+                    self.metric_flights.release(tickets[i])
+
+        # Wait for the requests claimed by other responders only after our
+        # own claims are done, so that responders never wait for each other
+        missing = []
+        for i in pending:
+            hit, result = self.metric_flights.wait(tickets[i],
+                                                   self.metric_wait_timeout)
+            if hit:
+                results[i] = result
+            else:
+                missing.append(i)
+
+        self.calculate_metrics(requests, missing, keys, results)
+
+        for i, request in enumerate(requests):
+            if 'type' in request and self.is_valid_request(request):
 
                 if 'channels' in request:
-                    data, times = self.unpack_snapshot(snapshot,
-                                                       request['channels'],
-                                                       time_window)
                     # TODO: Consider moving this to unpack_snapshot
                     if self.primary_node:
                         last_sample = time.time() - self.primary_last_sample_received.value
                         request['primary_last_sample_received'] = last_sample
 
-                else:
-                    data = []
-                    times = []
+                request['return'] = results[i]
+            else:
+                request['return'] = "Malformed request!"
 
-                if 'arguments' in request:
-                    arguments = request['arguments']
-                else:
-                    arguments = []
+        try:
+            return json.dumps(requests, default=mu.json_default)
+        except (TypeError, ValueError):
+            # Replace the results that can not be converted into JSON
+            for request in requests:
+                try:
+                    json.dumps(request.get('return'), default=mu.json_default)
+                except (TypeError, ValueError):
+                    request['return'] = "Result is not JSON serializable!"
+            return json.dumps(requests, default=mu.json_default)
+
+    def calculate_metrics(self, requests, indices, keys, results):
+        """ Calculate the metric requests at the given indices from a single
+            snapshot of the data. Results of cacheable requests are put into
+            the metric cache.
+
+            The requests are grouped by their channels and time-window, and
+            each distinct window is extracted from the snapshot once. The
+            requests of a group share the extracted data, which are therefore
+            read-only. With metric_threads > 1 the metrics are calculated in
+            a pool of threads.
 
-                data = {'data': data, 'time': times}
-                result = self.metric_pointers[request['type']](data, *arguments)
-                request['return'] = result
+        Args:
+            requests <list>: list of metric requests
+            indices <list>: indices of the requests to calculate
+            keys <list>: cache keys of the requests, None if not cached
+            results <dict>: results by index, filled in as they are
+                            calculated
+        """
+        indices = [i for i in indices
+                   if 'type' in requests[i] and self.is_valid_request(requests[i])]
+        if not indices:
+            return
+
+        selected = [requests[i] for i in indices]
+        snapshot = self.snapshot_data(self.get_channel_list(selected),
+                                      self.get_time_span(selected))
+
+        # Extract each distinct window once
+        windows = {}
+        for i in indices:
+            window = self.get_window_key(requests[i])
+            if window not in windows:
+                windows[window] = self.extract_window(snapshot, requests[i])
+
+        def calculate(i):
+            request = requests[i]
+
+            if 'arguments' in request:
+                arguments = request['arguments']
             else:
-                request['return'] = "Malformed request!"
+                arguments = []
 
-            results.append(request)
+            data, times = windows[self.get_window_key(request)]
+            data = {'data': list(data), 'time': list(times)}
+            try:
+                result = self.metric_pointers[request['type']](data, *arguments)
+            except Exception as e:
+                # A failing metric must not take down the responder
+                return mu.MetricError('Metric failed: {}: {}'
+                                      .format(type(e).__name__, e))
+
+            if keys[i] is not None:
+                self.metric_cache.put(keys[i], result)
+            return result
+
+        if self.metric_threads > 1 and len(indices) > 1:
+            # The pool is created in the responder, threads do not survive
+            # the fork that starts the responders
+            if self.metric_executor is None:
+                self.metric_executor = ThreadPoolExecutor(self.metric_threads)
+            for i, result in zip(indices,
+                                 self.metric_executor.map(calculate, indices)):
+                results[i] = result
+        else:
+            for i in indices:
+                results[i] = calculate(i)
 
-        return json.dumps(results)
+    def get_window_key(self, request):
+        """ Returns the channels and time-window of a request as a hashable
+            key, requests with equal keys use the same data.
+        """
+        channels = request.get('channels')
+        time_window = request.get('time_window')
+        return (tuple(channels) if channels is not None else None,
+                tuple(time_window) if time_window else None)
 
-    def handle_data(self, requests):
+    def extract_window(self, snapshot, request):
+        """ Extract the channels and time-window of a request from a snapshot
+            as read-only arrays.
+
+        Returns:
+            data <list> samples of each channel
+            times <list> time (in seconds) before the latest sample of each
+                         channel
+        """
+        if 'channels' not in request:
+            return [], []
+
+        if 'time_window' in request:
+            time_window = request['time_window']
+        else:
+            time_window = None
+
+        data, times = self.unpack_snapshot(snapshot,
+                                           request['channels'],
+                                           time_window)
+        for array in data + times:
+            if isinstance(array, np.ndarray):
+                array.flags.writeable = False
+        return data, times
+
+    def get_buffer_counts(self, channels):
+        """ Returns the number of samples written into the buffers of the
+            given channels.
+        """
+        return {channel: self.get_buffer(channel).count for channel in channels}
+
+    def metric_flight_key(self, request):
+        """ Returns the key identifying a metric request among the requests
+            in flight: the metric, channels, time-window and arguments.
+        """
+        return json.dumps([request['type'],
+                           request.get('channels', []),
+                           request.get('time_window'),
+                           request.get('arguments', [])])
+
+    def metric_cache_key(self, request, counts):
+        """ Returns the key of a metric request in the metric cache, or None
+            if the metric is not cached. The key changes whenever new samples
+            are written into any of the requested channels.
+
+        Args:
+            request <dict>: the metric request
+            counts <dict>: number of samples written into each channel
+        """
+        if 'type' not in request or not self.is_valid_request(request):
+            return None
+
+        metric = self.metric_pointers[request['type']]
+        if not getattr(metric, 'midas_cache', self.metric_cache_default):
+            return None
+
+        channels = request.get('channels', [])
+        return json.dumps([request['type'],
+                           channels,
+                           request.get('time_window'),
+                           request.get('arguments', []),
+                           [counts.get(channel) for channel in channels]])
+
+    def handle_data(self, requests, binary=False):
         """ Processes incoming data request
 
         Args:
             requests: JSON-formatted request or a list of multiple data requests
+            binary: return the samples as raw arrays instead of JSON (see
+                    utilities.pack_data). The arrays are float64 unless the
+                    request specifies "dtype": "float32".
         Returns:
-            JSON-formatted result string
+            JSON-formatted result string, or a list of frames (see
+            utilities.pack_data) if binary is True
         """
+        if binary:
+            pack = mu.pack_data
+        else:
+            pack = json.dumps
+
         try:
             requests = json.loads(requests)
         except ValueError:
-            return json.dumps({'Error': "Can't unpack request(s)!"})
+            return pack({'Error': "Can't unpack request(s)!"})
 
         if isinstance(requests, dict):
             requests = [requests]
 
         channels = self.get_channel_list(requests)
-        snapshot = self.snapshot_data(channels)
+        snapshot = self.snapshot_data(channels, self.get_time_span(requests))
 
         results = []
         for request in requests:
@@ -689,15 +1360,21 @@ class BaseNode(object):
 
                 data, times = self.unpack_snapshot(snapshot, channels,
                                                    time_window)
+                dtype = request.get('dtype', 'float64')
                 this_data = {}
                 for idx, ch in enumerate(channels):
-                    this_data[ch] = {'data': data[idx], 'time': times[idx]}
+                    if binary:
+                        this_data[ch] = {'data': data[idx].astype(dtype, copy=False),
+                                         'time': times[idx]}
+                    else:
+                        this_data[ch] = {'data': data[idx].tolist(),
+                                         'time': times[idx].tolist()}
                 request['return'] = this_data
             else:
                 request['return'] = "Malformed request!"
             results.append(request)
 
-        return json.dumps(results)
+        return pack(results)
 
     def handle_command(self, command):
         """ Handling function for commands
@@ -718,6 +1395,14 @@ class BaseNode(object):
             return_value = self.get_data_list()
         elif command == "get_topic_list":
             return_value = self.get_topic_list()
+        elif command == "describe":
+            return_value = self.get_description()
+        elif command == "get_publisher_stats":
+            return_value = self.get_publisher_stats()
+        elif command == "get_cache_stats":
+            return_value = self.get_cache_stats()
+        elif command == "get_scheduler_stats":
+            return_value = self.get_scheduler_stats()
         else:
             return_value = "unknown command"
 
@@ -729,6 +1414,26 @@ class BaseNode(object):
 
         # Add user-defined metrics to the metric list
         self.generate_metric_lists()
+        self.generate_schedule()
+
+        # Start the metric cache and the values of the incremental metrics
+        # shared by the responders, the manager process is only needed if
+        # a metric uses them
+        use_cache = self.metric_cache_size > 0 and self.has_cacheable_metrics()
+        if use_cache or self.incremental_metrics:
+            self.cache_manager = mu.CacheManager()
+            self.cache_manager.start()
+
+        if self.metric_coalesce:
+            self.metric_flights = mu.SingleFlight(timeout=self.metric_wait_timeout)
+
+        if use_cache:
+            self.metric_cache = self.cache_manager.MetricCache(self.metric_cache_size)
+
+        if self.incremental_metrics:
+            self.incremental_values = self.cache_manager.dict(
+                {metric.name: metric.value()
+                 for metric in self.incremental_metrics})
 
         # Create and configure beacon
         # TODO: Change argument names in utilities.py as well
@@ -740,7 +1445,12 @@ class BaseNode(object):
         self.beacon.port = self.port_frontend
 
         # Start the load-balancing broker
-        self.proc_broker = mp.Process(target=mu.LRU_queue_broker,
+        if self.broker_mode == 'proxy':
+            broker = mu.proxy_queue_broker
+        else:
+            broker = mu.LRU_queue_broker
+
+        self.proc_broker = mp.Process(target=broker,
                                       args=(self.url_frontend,
                                             self.url_backend,
                                             self.n_responders,
@@ -752,6 +1462,16 @@ class BaseNode(object):
             self.proc_publisher = mp.Process(target=self.publisher)
             self.proc_publisher.start()
 
+        # Start the streamer if it is configured
+        if self.run_streamer:
+            self.proc_streamer = mp.Process(target=self.streamer)
+            self.proc_streamer.start()
+
+        # Start the scheduler if there are scheduled metrics
+        if self.scheduled_jobs:
+            self.proc_scheduler = mp.Process(target=self.scheduler)
+            self.proc_scheduler.start()
+
         # If the node is a primary node, start the receiver
         if self.primary_node:
             self.proc_receiver = mp.Process(target=self.receiver)
@@ -807,9 +1527,29 @@ class BaseNode(object):
             if self.run_publisher:
                 self.proc_publisher.join()
 
+            if self.run_streamer:
+                self.proc_streamer.join()
+
+            if self.scheduled_jobs:
+                self.proc_scheduler.join()
+
             # Stop the beacon
             self.beacon.stop()
 
+            # Stop the metric cache
+            if self.cache_manager is not None:
+                self.cache_manager.shutdown()
+
+            if self.metric_flights is not None:
+                self.metric_flights.unlink()
+
+            # Free the shared memory of the data buffers
+            if self.primary_node:
+                self.primary_buffer.unlink()
+
+            for buf in self.secondary_buffers:
+                buf.unlink()
+
         else:
             print("Node '%s' is not running." % self.node_name)
 
@@ -836,7 +1576,7 @@ class BaseNode(object):
         """
 
         def check_num_args(fun_handle):
-            n_args = len(inspect.getargspec(fun_handle).args)
+            n_args = len(inspect.getfullargspec(fun_handle).args)
             if inspect.ismethod(fun_handle) and n_args >= 2:
                 return True
             elif not inspect.ismethod(fun_handle) and n_args >= 1:
@@ -854,6 +1594,41 @@ class BaseNode(object):
             if not check_num_args(metric):
                 raise AttributeError('Metric function has no arguments')
 
+        # Incremental metrics are requested like the other metrics, their
+        # functions return the latest value stored by the receiver
+        if self.incremental_metrics and not self.primary_node:
+            raise ValueError('Incremental metrics require a primary node')
+
+        self.incremental_columns = []
+        for metric in self.incremental_metrics:
+            channels = metric.channels or self.primary_channel_names
+            if not set(self.primary_channel_names).issuperset(channels):
+                raise ValueError('Incremental metric {} uses unknown channels'
+                                 .format(metric.name))
+            self.incremental_columns.append(
+                [self.primary_channel_names.index(channel)
+                 for channel in channels])
+
+            self.metric_names.append(metric.name)
+            self.metric_descriptions[metric.name] = metric.__doc__
+            self.metric_pointers[metric.name] = self.incremental_metric_function(metric)
+
+    def has_cacheable_metrics(self):
+        """ Returns True if the results of any metric are cached. """
+        return any(getattr(metric, 'midas_cache', self.metric_cache_default)
+                   for metric in self.metric_pointers.values())
+
+    def incremental_metric_function(self, metric):
+        """ Returns a metric function reading the latest value of an
+            incremental metric.
+        """
+        def incremental_value(x):
+            return self.incremental_values.get(metric.name)
+
+        # The value changes with every sample, caching it would not help
+        incremental_value.midas_cache = False
+        return incremental_value
+
     def generate_nodeinfo(self):
         """ Stores all node information in a dict """
         self.nodeinfo = {}
@@ -865,7 +1640,7 @@ class BaseNode(object):
         self.nodeinfo['channel_descriptions'] = ",".join(self.primary_channel_descriptions)
         self.nodeinfo['sampling_rate'] = self.primary_sampling_rate
         self.nodeinfo['buffer_size'] = self.primary_buffer_size_s
-        self.nodeinfo['buffer_full'] = self.primary_buffer_full.value
+        self.nodeinfo['buffer_full'] = int(self.primary_buffer.full)
 
     def get_metric_list(self):
         """ Returns the metrics list of the node as a dictionary where the name
@@ -887,6 +1662,52 @@ class BaseNode(object):
         """ Return the URL of the publisher socket in the node. """
         return self.url_publisher
 
+    def get_publisher_stats(self):
+        """ Return the counters of the publisher. """
+        return {'published': self.publisher_published.value,
+                'dropped': self.publisher_dropped.value,
+                'queue_full': self.publisher_queue_full.value,
+                'queue_size': self.publisher_queue_size,
+                'hwm': self.publisher_hwm}
+
+    def get_scheduler_stats(self):
+        """ Return the timing statistics of the scheduled metrics. """
+        stats = {}
+        for job, job_stats in zip(self.scheduled_jobs, self.scheduler_stats):
+            runs, overruns, last, maximum, total, failures = job_stats[:]
+            stats[job['name']] = {'interval': job['interval'],
+                                  'runs': int(runs),
+                                  'overruns': int(overruns),
+                                  'failures': int(failures),
+                                  'last_duration': last,
+                                  'max_duration': maximum,
+                                  'mean_duration': total / runs if runs else 0.0}
+        return stats
+
+    def get_cache_stats(self):
+        """ Return the counters of the metric cache and of the coalescing of
+            identical requests.
+        """
+        stats = {}
+        if self.metric_flights is not None:
+            stats.update(self.metric_flights.stats())
+
+        if self.metric_cache is None:
+            stats['enabled'] = False
+        else:
+            stats.update(self.metric_cache.stats())
+            stats['enabled'] = True
+        return stats
+
+    def get_description(self):
+        """ Return the metric, data and topic lists and the publisher URL
+            of the node in one dictionary.
+        """
+        return {'metrics': self.get_metric_list(),
+                'data': self.get_data_list(),
+                'topics': self.get_topic_list(),
+                'publisher': self.get_publisher_url()}
+
     def get_data_list(self):
         """ Returns the data list of the node as a dictionary where the name of
             the data is the key and the description is the value.
@@ -13,13 +13,20 @@
 
 import sys
 import zmq
+import json
 import time
+import struct
+import pickle
 import select
 import socket
+import hashlib
 import os.path
 import threading
 import configparser
-from multiprocessing import Lock, Value
+import collections
+import numpy as np
+from multiprocessing import Condition, Lock, Value, shared_memory
+from multiprocessing.managers import BaseManager, DictProxy
 
 
 class Beacon(object):
@@ -125,37 +132,981 @@ class DataState(object):
         return(self.state.value)
 
 
-def discover_all_nodes(timeout=10, port_broadcast=5670):
-    """ Discover all MIDAS nodes and return them as a dictionary."""
+class SharedMemoryObject(object):
+
+    """ Base class for objects kept in a block of
+        multiprocessing.shared_memory and accessed through NumPy views.
+
+        Subclasses create the block with create_shm, create the views in
+        attach and list the attributes holding them in shm_views. Views into
+        the shared memory can not be pickled, so a pickled object (e.g.
+        passed to a child process) carries the name of the block instead
+        and re-attaches to it.
+    """
+
+    # attributes holding the views into the shared memory
+    shm_views = []
+
+    def create_shm(self, size):
+        """ Create the shared memory block and the views into it. """
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.attach()
+
+    def attach(self):
+        """ Create the NumPy views into the shared memory block. """
+        raise NotImplementedError
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        for key in ['shm'] + self.shm_views:
+            del state[key]
+        state['shm_name'] = self.shm.name
+        return state
+
+    def __setstate__(self, state):
+        shm_name = state.pop('shm_name')
+        self.__dict__.update(state)
+        try:
+            self.shm = shared_memory.SharedMemory(name=shm_name, track=False)
+        except TypeError:
+            self.shm = shared_memory.SharedMemory(name=shm_name)
+        self.attach()
+
+    def close(self):
+        """ Detach from the shared memory. """
+        for key in self.shm_views:
+            setattr(self, key, None)
+        self.shm.close()
+
+    def unlink(self):
+        """ Detach from and free the shared memory. """
+        self.close()
+        self.shm.unlink()
+
+
+class RingBuffer(SharedMemoryObject):
+
+    """ Circular buffer for multichannel data stored in shared memory.
+
+        The samples are kept in a (n_channels + 1) x buffer_size array of
+        doubles in multiprocessing.shared_memory, the last row holding the
+        time stamps. The array is exposed as NumPy views (data and time), so
+        all processes of a node read and write the same memory. The total
+        number of samples written is kept in a header in front of the array.
+
+        The header also holds a sequence counter (seqlock) that is odd while
+        a write is in progress, and the count that the write in progress
+        will reach. read() copies the data without locking and retries if a
+        write overlapped the copy. If max_retries copies in a row overlap a
+        write (a copy that is slower than the write period), the last copy
+        is kept without the oldest samples, which may have been overwritten.
+        Readers never lock the buffer, so they never block the writer.
+        Concurrent writers must still be serialized, e.g. with the lock of
+        the buffer.
+    """
+
+    shm_views = ['header', 'buffer', 'data', 'time']
+
+    def __init__(self, n_channels, buffer_size, max_retries=2):
+        self.n_channels = n_channels
+        self.buffer_size = buffer_size
+        self.max_retries = max_retries
+        self.lock = Lock()
+
+        self.create_shm(24 + 8 * (n_channels + 1) * buffer_size)
+        self.header[:] = 0
+        self.buffer[:] = 0
+
+    def attach(self):
+        """ Create the NumPy views into the shared memory block. """
+        self.header = np.ndarray((3,), dtype=np.int64, buffer=self.shm.buf)
+        self.buffer = np.ndarray((self.n_channels + 1, self.buffer_size),
+                                 dtype=np.float64,
+                                 buffer=self.shm.buf,
+                                 offset=24)
+        self.data = self.buffer[:-1]
+        self.time = self.buffer[-1]
+
+    @property
+    def count(self):
+        """ Total number of samples written into the buffer. """
+        return int(self.header[0])
+
+    @property
+    def sequence(self):
+        """ Sequence counter of the buffer, odd while a write is in progress. """
+        return int(self.header[1])
+
+    @property
+    def wptr(self):
+        """ Index of the position the next sample is written into. """
+        return self.count % self.buffer_size
+
+    @property
+    def full(self):
+        """ True once the buffer has wrapped around at least once. """
+        return self.count >= self.buffer_size
+
+    @property
+    def last_time(self):
+        """ Time stamp of the latest sample (0 if the buffer is empty). """
+        count = self.count
+        if count == 0:
+            return 0.0
+        return float(self.time[(count - 1) % self.buffer_size])
+
+    def segments(self, span=None, since=None, count=None):
+        """ Return the slices of the buffer that contain data, oldest first.
+
+            The buffered samples form at most two contiguous segments: the
+            samples after the write pointer and the samples before it.
+
+        Args:
+            span: <float> only include samples at most this many seconds
+                  older than the latest sample (default all samples)
+            since: <int> only include the samples written after the first
+                   since samples (see count)
+            count: <int> number of samples written (default self.count)
+        """
+        if count is None:
+            count = self.count
+        wptr = count % self.buffer_size
+        if count < self.buffer_size:
+            segments = [slice(0, wptr)]
+        elif wptr == 0:
+            segments = [slice(0, self.buffer_size)]
+        else:
+            segments = [slice(wptr, self.buffer_size), slice(0, wptr)]
+
+        if since is not None:
+            # skip the oldest samples that have been read before
+            n_skip = min(count, self.buffer_size) - max(0, count - since)
+            skipped = []
+            for seg in segments:
+                start = seg.start + min(max(0, n_skip), seg.stop - seg.start)
+                n_skip -= start - seg.start
+                if start < seg.stop:
+                    skipped.append(slice(start, seg.stop))
+            segments = skipped
+
+        if span is None or count == 0:
+            return segments
+
+        # Trim the oldest samples by bisecting the (ascending) time stamps
+        last = self.time[(count - 1) % self.buffer_size]
+        trimmed = []
+        for seg in segments:
+            start = seg.start + find_start(self.time[seg], last, span)
+            if start < seg.stop:
+                trimmed.append(slice(start, seg.stop))
+        return trimmed
+
+    def read(self, rows=None, span=None):
+        """ Copy buffered samples in chronological order.
+
+            The copy is made without locking and is retried if the buffer
+            was written to while copying (see consistent_copy).
+
+        Args:
+            rows: <list> indices of the channels to copy (default all)
+            span: <float> only copy samples at most this many seconds older
+                  than the latest sample (default all samples)
+        Returns:
+            data: <array> len(rows) x n_samples array of samples
+            times: <array> time stamps of the samples
+        """
+        if rows is None:
+            rows = range(self.n_channels)
+
+        _, data, times = self.consistent_copy(rows, span)
+        return data, times
+
+    def read_since(self, since, rows=None):
+        """ Copy the samples written after the first since samples, e.g.,
+            the samples that a reader has not seen yet. If more than
+            buffer_size samples have been written since, only the latest
+            buffer_size samples are copied. See read.
+
+        Args:
+            since: <int> number of samples written when the reader last read
+                   the buffer (the count returned by the previous call)
+            rows: <list> indices of the channels to copy (default all)
+        Returns:
+            count: <int> number of samples written, since for the next call
+            data: <array> len(rows) x n_samples array of new samples
+            times: <array> time stamps of the new samples
+        """
+        if rows is None:
+            rows = range(self.n_channels)
+
+        return self.consistent_copy(rows, since=since)
+
+    def consistent_copy(self, rows, span=None, since=None):
+        """ Copy buffered samples that are not modified while copying.
+
+            The copy is tried max_retries times and kept if no write
+            overlapped it (sequence counter). After that, one more copy is
+            made and its oldest samples are dropped if a write that started
+            before the copy ended may have overwritten them. The newest
+            samples are never overwritten by a write, so this copy is
+            consistent as well, it may only start slightly later.
+
+        Returns:
+            count: <int> number of samples written when the copy was made
+            data: <array> len(rows) x n_samples array of samples
+            times: <array> time stamps of the samples
+        """
+        for _ in range(self.max_retries):
+            sequence = self.header[1]
+            if sequence & 1:
+                time.sleep(0)
+                continue
+
+            count = self.count
+            data, times = self.copy(rows, span, since, count)
+
+            if self.header[1] == sequence:
+                return count, data, times
+
+        count = self.count
+        data, times = self.copy(rows, span, since, count)
+
+        # Samples older than buffer_size before the count reached by the
+        # writes may have been overwritten while copying
+        n_overwritten = int(self.header[2]) - self.buffer_size - (count - len(times))
+        if n_overwritten > 0:
+            data = data[:, n_overwritten:]
+            times = times[n_overwritten:]
+        return count, data, times
+
+    def copy(self, rows, span=None, since=None, count=None):
+        """ Copy buffered samples in chronological order without checking for
+            concurrent writes (see read).
+        """
+        segments = self.segments(span, since, count)
+        n = sum(seg.stop - seg.start for seg in segments)
+
+        data = np.empty((len(rows), n))
+        times = np.empty(n)
+
+        i = 0
+        for seg in segments:
+            k = seg.stop - seg.start
+            for j, row in enumerate(rows):
+                data[j, i:i + k] = self.data[row, seg]
+            times[i:i + k] = self.time[seg]
+            i += k
+
+        return data, times
+
+    def push(self, values, t):
+        """ Write a single sample. Concurrent writers must hold the lock.
+
+        Args:
+            values: <list> one value per channel
+                 t: <float> time stamp of the sample
+        """
+        # Convert and check before the write begins, so that a bad sample
+        # can not leave the sequence counter odd
+        values = np.asarray(values, dtype=np.float64)
+        if values.size != self.n_channels:
+            raise ValueError('Expected {} values, got {}'
+                             .format(self.n_channels, values.size))
+        t = float(t)
+
+        self.header[1] += 1  # WRITE-BEGIN
+        try:
+            self.header[2] = max(self.header[2], self.header[0] + 1)
+            wptr = self.wptr
+            self.data[:, wptr] = values.reshape(self.n_channels)
+            self.time[wptr] = t
+            self.header[0] += 1
+        finally:
+            self.header[1] += 1  # WRITE-END
+
+    def write(self, values, times):
+        """ Write a block of samples. Concurrent writers must hold the lock.
+
+        Args:
+            values: <array> samples as a n_samples x n_channels array
+             times: <array> time stamps of the samples
+        """
+        # Convert and check before the write begins, so that a bad block
+        # can not leave the sequence counter odd
+        values = np.asarray(values, dtype=np.float64)
+        times = np.asarray(times, dtype=np.float64).reshape(-1)
+        n = len(times)
+        if values.shape != (n, self.n_channels):
+            raise ValueError('Expected {} x {} values, got {}'
+                             .format(n, self.n_channels, values.shape))
+
+        # Only the newest samples fit if the block is larger than the buffer
+        skip = 0
+        if n > self.buffer_size:
+            skip = n - self.buffer_size
+            values = values[skip:]
+            times = times[skip:]
+            n = self.buffer_size
+
+        self.header[1] += 1  # WRITE-BEGIN
+        try:
+            self.header[2] = max(self.header[2], self.header[0] + skip + n)
+            self.header[0] += skip
+
+            # A block wraps around the end of the buffer at most once
+            wptr = self.wptr
+            n_head = min(n, self.buffer_size - wptr)
+            n_tail = n - n_head
+
+            self.data[:, wptr:wptr + n_head] = values[:n_head].T
+            self.data[:, :n_tail] = values[n_head:].T
+            self.time[wptr:wptr + n_head] = times[:n_head]
+            self.time[:n_tail] = times[n_head:]
+            self.header[0] += n
+        finally:
+            self.header[1] += 1  # WRITE-END
+
+
+class SocketPool(object):
+
+    """ Thread-safe pool of persistent REQ sockets connected to one node.
+
+        Sockets are created on demand up to the size of the pool and are
+        reused by all threads, so a request does not pay for a new connection.
+        The size of the pool limits the number of concurrent requests to the
+        node. Sockets that fail or time out are closed and replaced by a new
+        one on demand.
+    """
+
+    def __init__(self, context, address, size=5):
+        """ Create an empty pool.
+
+        Args:
+            context: <zmq.Context> context used for creating the sockets
+            address: <str> ZeroMQ URL of the node
+            size: <int> maximum number of sockets
+        """
+        self.context = context
+        self.address = address
+        self.size = max(1, int(size))
+        self.idle = []
+        self.n_sockets = 0
+        self.closed = False
+        self.condition = threading.Condition()
+
+    def acquire(self, block=True, timeout=None):
+        """ Take a socket from the pool, connecting a new one if the pool
+            is not yet full.
+
+        Args:
+            block: <bool> wait for a socket if all are in use
+            timeout: <float> seconds to wait for a socket, None waits forever
+        Returns:
+            sock: <zmq.Socket> a REQ socket connected to the node, None if
+                  all sockets are in use and block is False or the timeout
+                  expired
+        """
+        if timeout is not None:
+            deadline = time.time() + timeout
+
+        with self.condition:
+            while not self.idle and self.n_sockets >= self.size:
+                if not block:
+                    return None
+                if timeout is None:
+                    self.condition.wait()
+                    continue
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    return None
+                self.condition.wait(remaining)
+            if self.idle:
+                return self.idle.pop()
+            self.n_sockets += 1
 
-    # Loop until the socket is free.
-    # This is needed in order to avoid conflicts when multiple dispatchers
-    # are used on the same host.
-    while True:
         try:
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.bind(('', port_broadcast))
-            s.setblocking(0)
-            break
-        except OSError:
-            pass
+            sock = self.context.socket(zmq.REQ)
+            sock.setsockopt(zmq.LINGER, 0)
+            sock.connect(self.address)
+        except zmq.ZMQError:
+            with self.condition:
+                self.n_sockets -= 1
+                self.condition.notify()
+            raise
+        return sock
+
+    def release(self, sock, broken=False):
+        """ Return a socket to the pool. Broken sockets, and all sockets
+            after the pool has been closed, are closed instead.
+
+        Args:
+            sock: <zmq.Socket> socket taken with acquire
+            broken: <bool> the socket is in an unknown state
+        """
+        with self.condition:
+            if broken or self.closed:
+                sock.close()
+                self.n_sockets -= 1
+            else:
+                self.idle.append(sock)
+            self.condition.notify()
+
+    def request(self, message_type, message, timeout=None):
+        """ Send a request to the node and wait for the reply.
+
+        Args:
+            message_type: <str> type of the message
+            message: <str> the message
+            timeout: <float> seconds to wait for the reply, None waits forever
+        Returns:
+            frames: <list> the frames of the reply, None on timeout
+        """
+        return self.send_recv(self.acquire(), message_type, message, timeout)
+
+    def send_recv(self, sock, message_type, message, timeout=None):
+        """ Send a request over a socket taken with acquire, wait for the
+            reply and release the socket. A REQ socket that has not received
+            its reply can not be used again, so it is replaced on timeout.
+
+        Args:
+            sock: <zmq.Socket> socket taken with acquire
+            message_type: <str> type of the message
+            message: <str> the message
+            timeout: <float> seconds to wait for the reply, None waits forever
+        Returns:
+            frames: <list> the frames of the reply, None on timeout
+        """
+        try:
+            midas_send(sock, message_type, message)
+            if timeout is not None and not sock.poll(int(timeout * 1000)):
+                self.release(sock, broken=True)
+                return None
+            frames = midas_recv_reply(sock)
+        except BaseException:
+            self.release(sock, broken=True)
+            raise
+        self.release(sock)
+        return frames
+
+    def close(self):
+        """ Close the idle sockets. Sockets in use are closed when they are
+            released.
+        """
+        with self.condition:
+            self.closed = True
+            for sock in self.idle:
+                sock.close()
+            self.n_sockets -= len(self.idle)
+            self.idle = []
+
+
+class MetricCache(object):
+
+    """ Least recently used cache for the results of metric requests.
+
+        The cache lives in a CacheManager process so that all responders of
+        a node share it, see BaseNode.handle_metric.
+    """
+
+    def __init__(self, max_size=128):
+        """ Create an empty cache.
+
+        Args:
+            max_size: <int> maximum number of cached results
+        """
+        self.max_size = max_size
+        self.results = collections.OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """ Look up a result.
+
+        Returns:
+            hit: <bool> True if the result was found
+            result: the cached result, None if not found
+        """
+        with self.lock:
+            if key in self.results:
+                self.results.move_to_end(key)
+                self.hits += 1
+                return True, self.results[key]
+
+            self.misses += 1
+            return False, None
+
+    def put(self, key, result):
+        """ Store a result, evicting the least recently used result if the
+            cache is full.
+        """
+        with self.lock:
+            self.results[key] = result
+            self.results.move_to_end(key)
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.results.clear()
+
+    def stats(self):
+        """ Return the number of hits and misses and the size of the cache.
+        """
+        with self.lock:
+            return {'hits': self.hits,
+                    'misses': self.misses,
+                    'size': len(self.results),
+                    'max_size': self.max_size}
+
+
+class SingleFlight(SharedMemoryObject):
+
+    """ Table of the metric requests being calculated by the responders of a
+        node, used to calculate identical concurrent requests only once.
+
+        A responder claims a request before calculating it. A responder
+        receiving the same request while the claim is in flight waits for
+        the result instead of calculating it again. The table and the
+        pickled results are kept in multiprocessing.shared_memory, so no
+        extra process is needed (see SharedMemoryObject).
+
+        Results larger than result_size bytes are not shared, and claims
+        older than timeout seconds can be taken over, so a waiter never
+        waits for a responder that died.
+    """
+
+    # columns of the slot table
+    KEY, STATE, GENERATION, WAITERS, SIZE = range(5)
+
+    # states of a slot
+    FREE, IN_FLIGHT, DONE, FAILED = range(4)
+
+    shm_views = ['counters', 'slots', 'claim_time', 'results']
+
+    def __init__(self, n_slots=64, result_size=32768, timeout=10.0):
+        """ Create an empty table.
+
+        Args:
+            n_slots: <int> maximum number of requests in flight, requests
+                     are calculated without coalescing if all are in use
+            result_size: <int> maximum size of a shared result in bytes
+            timeout: <float> seconds a waiter waits for a result
+        """
+        self.n_slots = n_slots
+        self.result_size = result_size
+        self.timeout = timeout
+        self.condition = Condition()
+
+        self.create_shm(8 * 3 + 8 * 6 * n_slots + n_slots * result_size)
+        self.counters[:] = 0
+        self.slots[:] = 0
+        self.claim_time[:] = 0
+
+    def attach(self):
+        """ Create the NumPy views into the shared memory block. """
+        # claimed, coalesced and timed out requests
+        self.counters = np.ndarray((3,), dtype=np.int64, buffer=self.shm.buf)
+        self.slots = np.ndarray((self.n_slots, 5), dtype=np.int64,
+                                buffer=self.shm.buf, offset=8 * 3)
+        self.claim_time = np.ndarray((self.n_slots,), dtype=np.float64,
+                                     buffer=self.shm.buf,
+                                     offset=8 * 3 + 8 * 5 * self.n_slots)
+        self.results = np.ndarray((self.n_slots, self.result_size),
+                                  dtype=np.uint8,
+                                  buffer=self.shm.buf,
+                                  offset=8 * 3 + 8 * 6 * self.n_slots)
+
+    @staticmethod
+    def hash_key(key):
+        """ Return a request key (a string) as a 64-bit integer. """
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little', signed=True)
+
+    def claim(self, key):
+        """ Claim a request for the caller if it is not being calculated.
+            The caller must finish the claim with finish or release.
+
+        Args:
+            key: <str> key of the request
+        Returns:
+            state: <str> 'claimed' if the caller should calculate the
+                   request, 'pending' if another caller is calculating it
+                   (see wait) and 'busy' if the table is full
+            ticket: <tuple> the claim, passed to finish, release or wait
+        """
+        h = self.hash_key(key)
+        now = time.time()
+        with self.condition:
+            slots = self.slots
+            age = now - self.claim_time
+
+            match = np.flatnonzero((slots[:, self.STATE] == self.IN_FLIGHT) &
+                                   (slots[:, self.KEY] == h))
+            if len(match):
+                s = int(match[0])
+                if age[s] < self.timeout:
+                    slots[s, self.WAITERS] += 1
+                    return 'pending', (s, int(slots[s, self.GENERATION]))
+            else:
+                # Free slots and slots whose claimant or waiters have gone
+                # away without finishing
+                free = np.flatnonzero((slots[:, self.STATE] == self.FREE) |
+                                      (age > 2 * self.timeout))
+                if not len(free):
+                    return 'busy', None
+                s = int(free[0])
+
+            slots[s, self.KEY] = h
+            slots[s, self.STATE] = self.IN_FLIGHT
+            slots[s, self.GENERATION] += 1
+            slots[s, self.WAITERS] = 0
+            slots[s, self.SIZE] = 0
+            self.claim_time[s] = now
+            self.counters[0] += 1
+
+            # Waiters of a claim that was taken over give up
+            self.condition.notify_all()
+            return 'claimed', (s, int(slots[s, self.GENERATION]))
+
+    def finish(self, ticket, result):
+        """ Share the result of a claimed request with its waiters. """
+        s, generation = ticket
+        payload = pickle.dumps(result, pickle.HIGHEST_PROTOCOL)
+
+        with self.condition:
+            slots = self.slots
+            if slots[s, self.GENERATION] != generation:
+                return
+
+            if slots[s, self.WAITERS] == 0:
+                slots[s, self.STATE] = self.FREE
+            elif len(payload) <= self.result_size:
+                self.results[s, :len(payload)] = np.frombuffer(payload,
+                                                              dtype=np.uint8)
+                slots[s, self.SIZE] = len(payload)
+                slots[s, self.STATE] = self.DONE
+            else:
+                slots[s, self.STATE] = self.FAILED
+            self.condition.notify_all()
+
+    def release(self, ticket):
+        """ Give up a claim without a result, the waiters calculate the
+            request themselves.
+        """
+        s, generation = ticket
+        with self.condition:
+            slots = self.slots
+            if slots[s, self.GENERATION] != generation:
+                return
+
+            if slots[s, self.WAITERS] == 0:
+                slots[s, self.STATE] = self.FREE
+            else:
+                slots[s, self.STATE] = self.FAILED
+            self.condition.notify_all()
+
+    def wait(self, ticket, timeout=None):
+        """ Wait for a pending request to be calculated.
+
+        Args:
+            ticket: <tuple> the ticket returned by claim
+            timeout: <float> seconds to wait (default self.timeout)
+        Returns:
+            hit: <bool> True if the result was shared, False if the request
+                 was released, its result was too large or the wait timed
+                 out
+            result: the result, None if not shared
+        """
+        if timeout is None:
+            timeout = self.timeout
+
+        s, generation = ticket
+        with self.condition:
+            slots = self.slots
+            self.condition.wait_for(
+                lambda: (slots[s, self.GENERATION] != generation or
+                         slots[s, self.STATE] != self.IN_FLIGHT),
+                timeout)
+
+            if slots[s, self.GENERATION] != generation:
+                return False, None
+
+            state = slots[s, self.STATE]
+            if state == self.DONE:
+                payload = self.results[s, :slots[s, self.SIZE]].tobytes()
+                result = pickle.loads(payload)
+                self.counters[1] += 1
+            else:
+                result = None
+                if state == self.IN_FLIGHT:
+                    self.counters[2] += 1
+
+            slots[s, self.WAITERS] -= 1
+            if slots[s, self.WAITERS] == 0 and state != self.IN_FLIGHT:
+                slots[s, self.STATE] = self.FREE
+
+            return bool(state == self.DONE), result
+
+    def stats(self):
+        """ Return the number of claimed, coalesced and timed out requests
+            and the number of requests in flight.
+        """
+        with self.condition:
+            return {'claimed': int(self.counters[0]),
+                    'coalesced': int(self.counters[1]),
+                    'wait_timeouts': int(self.counters[2]),
+                    'in_flight': int(np.sum(self.slots[:, self.STATE] ==
+                                            self.IN_FLIGHT))}
+
+
+class CacheManager(BaseManager):
+
+    """ Manager process hosting the MetricCache and the values of the
+        incremental metrics of a node.
+    """
+    pass
+
+
+CacheManager.register('MetricCache', MetricCache)
+CacheManager.register('dict', dict, DictProxy)
+
+
+def metric_cache(enabled=True):
+    """ Decorator choosing whether the results of a metric function are
+        cached, overriding the default of the node (metric_cache_default).
+        Only metrics that depend on nothing but their data and arguments
+        should be cached.
+
+        Example:
+            @mu.metric_cache()
+            def metric_c(x, nperseg=256):
+                ...
+    """
+    def decorate(fn):
+        fn.midas_cache = enabled
+        return fn
+    return decorate
+
+
+class IncrementalMetric(object):
+
+    """ Base class for metrics that are updated as samples arrive instead of
+        being calculated from a window of data on request.
+
+        The receiver of a primary node calls update with the samples received
+        since the last update every incremental_interval seconds and stores
+        value in memory shared with the responders, so requesting the metric
+        only reads the latest value. Subclasses
+        override init, update and value, and the docstring of the subclass
+        is the description of the metric. See RunningStats in
+        examples/node_example_a.py.
+
+        Example:
+            class RunningMean(mu.IncrementalMetric):
+                def init(self):
+                    self.n = 0
+                    self.mean = 0.0
+
+                def update(self, data, times):
+                    self.n += len(data)
+                    self.mean += (data[:, 0].sum() - len(data) * self.mean) / self.n
+
+                def value(self):
+                    return self.mean
+
+            self.incremental_metrics.append(RunningMean('running_mean',
+                                                        ['Ch1']))
+    """
+
+    def __init__(self, name, channels=None):
+        """ Create the metric.
+
+        Args:
+            name: <str> name of the metric used in requests
+            channels: <list> names of the primary channels passed to
+                      update, all primary channels if None
+        """
+        self.name = name
+        self.channels = channels
+        self.init()
+
+    def init(self):
+        """ Initialize the state of the metric. """
+        pass
+
+    def update(self, data, times):
+        """ Update the state with new samples.
+
+        Args:
+            data: <np.ndarray> new samples, one row per sample and one column
+                  per channel
+            times: <np.ndarray> time stamps of the new samples
+        """
+        raise NotImplementedError
+
+    def value(self):
+        """ Return the current value of the metric (JSON serializable). """
+        raise NotImplementedError
+
+
+def schedule(interval, channels=None, time_window=None, arguments=None,
+             secondary_channels=None, topic=None):
+    """ Decorator scheduling a metric function to be evaluated every interval
+        seconds by the scheduler of the node, see BaseNode.scheduler. The
+        interval can be changed with the node option schedule.
+
+    Args:
+        interval: <float> seconds between evaluations
+        channels: <list> channels passed to the metric
+        time_window: <list> time-window of the data, as in metric requests
+        arguments: <list> additional arguments of the metric
+        secondary_channels: <list> secondary channels receiving the result,
+                            one value per channel
+        topic: <str> topic on which the result is published
+
+    Example:
+        @mu.schedule(1.0, channels=['Ch1'], time_window=[10],
+                     secondary_channels=['S-Ch1', 'S-Ch2'], topic='stats')
+        def stats(self, x):
+            return np.mean(x['data'][0]), np.std(x['data'][0])
+    """
+    def decorate(fn):
+        fn.midas_schedule = {'interval': interval,
+                             'channels': channels,
+                             'time_window': time_window,
+                             'arguments': arguments,
+                             'secondary_channels': secondary_channels,
+                             'topic': topic}
+        return fn
+    return decorate
+
+
+class NodeRegistry(object):
+
+    """ Long-lived listener for the beacons of MIDAS nodes.
+
+        Keeps a registry of the nodes that are online and when each node was
+        last heard from. A node that has not been heard from for ttl seconds
+        is removed. The callbacks on_add and on_remove are called from the
+        listener thread as soon as a node appears, changes or expires.
+    """
+
+    def __init__(self,
+                 port_broadcast=5670,
+                 ttl=15,
+                 on_add=None,
+                 on_remove=None):
+        """ Create the registry, but do not start listening.
+
+        Args:
+            port_broadcast: <int> UDP port of the beacons
+            ttl: <float> seconds after which a silent node is removed
+            on_add: <function> called with the name and the beacon message
+                    (see validate_message) of a new or changed node
+            on_remove: <function> called with the name of an expired node
+        """
+        self.port_broadcast = port_broadcast
+        self.ttl = ttl
+        self.on_add = on_add
+        self.on_remove = on_remove
+
+        self.nodes = {}
+        self.last_seen = {}
+        self.lock = threading.Lock()
+        self.is_running = False
+
+    def start(self):
+        """ Start listening in a background thread. """
+        self.socket = broadcast_listener(self.port_broadcast)
+        self.is_running = True
+        self.thread = threading.Thread(target=self.listen)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        """ Stop listening. """
+        self.is_running = False
+
+    def get_nodes(self):
+        """ Return the nodes that are online as a dictionary. """
+        with self.lock:
+            return dict(self.nodes)
+
+    def listen(self):
+        buffersize = 1024
+
+        # wake up regularly to expire nodes and to notice stop()
+        interval = min(1.0, self.ttl / 2.0)
+
+        while self.is_running:
+            result = select.select([self.socket], [], [], interval)
+            if result[0]:
+                message = self.socket.recv(buffersize).decode('ascii')
+                if message.startswith('midas'):
+                    self.update(validate_message(message))
+            self.expire()
+
+        self.socket.close()
+
+    def update(self, message):
+        name = message['name']
+        with self.lock:
+            changed = self.nodes.get(name) != message
+            self.nodes[name] = message
+            self.last_seen[name] = time.time()
+
+        if changed and self.on_add:
+            self.on_add(name, message)
+
+    def expire(self):
+        t_expire = time.time() - self.ttl
+        with self.lock:
+            expired = [name for name in self.nodes
+                       if self.last_seen[name] < t_expire]
+            for name in expired:
+                del self.nodes[name]
+                del self.last_seen[name]
+
+        for name in expired:
+            if self.on_remove:
+                self.on_remove(name)
+
+
+def broadcast_listener(port_broadcast=5670):
+    """ Return a non-blocking UDP socket bound to the broadcast port. The
+        address can be reused, so that several dispatchers on the same host
+        can listen to the beacons at the same time.
+    """
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    s.bind(('', port_broadcast))
+    s.setblocking(0)
+    return s
+
+
+def discover_all_nodes(timeout=10, port_broadcast=5670):
+    """ Discover all MIDAS nodes and return them as a dictionary.
+
+        Listens to the beacons for timeout seconds, see NodeRegistry for
+        discovering nodes continuously.
+    """
+
+    s = broadcast_listener(port_broadcast)
 
     buffersize = 1024
     t_start = time.time()
 
-    tmp_list = []
     node_dict = {}
 
     while(time.time() - t_start < timeout):
-        result = select.select([s], [], [], timeout)
+        result = select.select([s], [], [], timeout - (time.time() - t_start))
         if result[0]:
             message = result[0][0].recv(buffersize)
             message = message.decode('ascii')
             if message.startswith('midas'):
                 message = validate_message(message)
-                if message not in tmp_list:
-                    tmp_list.append(message)
-                    node_dict[message['name']] = message
+                node_dict[message['name']] = message
 
     s.close()
 
@@ -211,24 +1162,218 @@ def make_string(d, key_list):
 
 
 def midas_send(socket, message_type, message, address=None):
-    """ Temporary messasing functions for debuggings. """
-    if address:
-        socket.send(address, zmq.SNDMORE)
-        socket.send(b"", zmq.SNDMORE)
-        socket.send_string(message)
+    """ Send a message following the MIDAS messaging protocol.
+
+        Requests are sent as [message type][message] and replies as
+        [address][empty][message], where the address is the envelope given
+        by midas_recv. An empty envelope (REP sockets) sends only the
+        message. The message can be a string, bytes or a list of frames
+        (e.g. binary data replies). All frames are sent as one multipart
+        message without copying large frames.
+    """
+    if address is None:
+        frames = [message_type.encode()]
+    elif address:
+        if isinstance(address, bytes):
+            address = [address]
+        frames = list(address) + [b""]
     else:
-        socket.send_string(message_type, zmq.SNDMORE)
-        socket.send_string(message)
+        frames = []
+
+    if isinstance(message, str):
+        frames.append(message.encode())
+    elif isinstance(message, list):
+        frames.extend(message)
+    else:
+        frames.append(message)
+
+    socket.send_multipart(frames, copy=False)
 
 
 def midas_recv(socket):
-    address = socket.recv()
-    socket.recv()  # Empty sequence
-    msg_type = socket.recv_string()
-    message = socket.recv_string()
+    """ Receive a request following the MIDAS messaging protocol.
+
+    Returns:
+        address: <list> the envelope (address frames) of the sender, empty
+                        for REP sockets that keep the envelope themselves
+        msg_type: <str> type of the message
+        message: <str> the message
+    """
+    frames = socket.recv_multipart()
+
+    # A REP socket receives only [message type][message]
+    address = []
+    if len(frames) > 2:
+        delimiter = frames.index(b"")
+        address = frames[:delimiter]
+        frames = frames[delimiter + 1:]
+
+    msg_type = frames[0].decode()
+    message = frames[1].decode()
     return address, msg_type, message
 
 
+def midas_recv_reply(socket):
+    """ Receive a (possibly multipart) reply without copying large frames.
+
+    Returns:
+        frames: <list> the frames of the reply as zmq.Frame objects
+    """
+    return socket.recv_multipart(copy=False)
+
+
+def pack_data(results):
+    """ Pack the results of data requests into a binary message.
+
+        The message starts with the length of a JSON header (uint32, little
+        endian) followed by the header and the raw arrays. The header holds
+        the results of the requests with the data of each channel replaced
+        by the number of samples and the dtypes of the samples and time
+        stamps. The samples and the time stamps of each channel follow the
+        header in the order the channels appear in it.
+
+        The header and the arrays are returned as separate frames so that
+        the arrays can be sent without copying them. Joining the frames gives
+        the message.
+
+    Args:
+        results: <list> results of data requests, where 'return' maps channel
+                 names to dicts with 'data' and 'time' arrays
+    Returns:
+        frames: <list> the length and header as bytes, followed by the arrays
+    """
+
+    arrays = []
+
+    if isinstance(results, list):
+        header = []
+        for result in results:
+            result = dict(result)
+            if isinstance(result.get('return'), dict):
+                channels = {}
+                for ch, values in result['return'].items():
+                    data = np.ascontiguousarray(values['data'])
+                    times = np.ascontiguousarray(values['time'], dtype=np.float64)
+                    channels[ch] = {'n_samples': len(data),
+                                    'dtype': data.dtype.str,
+                                    'time_dtype': times.dtype.str}
+                    arrays.extend([data, times])
+                result['return'] = channels
+            header.append(result)
+    else:
+        header = results
+
+    header = json.dumps(header).encode()
+
+    return [struct.pack('<I', len(header)) + header] + arrays
+
+
+def unpack_data(message):
+    """ Unpack a binary data message created by pack_data.
+
+    Args:
+        message: <bytes> the packed message (or a list of its frames)
+    Returns:
+        results: results of the data requests with the samples and time
+                 stamps of each channel as NumPy arrays
+    """
+
+    if isinstance(message, list):
+        message = b''.join(message)
+
+    n = struct.unpack_from('<I', message)[0]
+    results = json.loads(bytes(message[4:4 + n]).decode())
+    offset = 4 + n
+
+    if isinstance(results, list):
+        for result in results:
+            if isinstance(result.get('return'), dict):
+                for ch, info in result['return'].items():
+                    values = {}
+                    for key, dtype in [('data', info['dtype']),
+                                       ('time', info['time_dtype'])]:
+                        values[key] = np.frombuffer(message,
+                                                    dtype=dtype,
+                                                    count=info['n_samples'],
+                                                    offset=offset)
+                        offset += values[key].nbytes
+                    result['return'][ch] = values
+
+    return results
+
+
+def pack_payload(data):
+    """ Pack published data into a header and a payload frame.
+
+        NumPy arrays (and scalars) are sent as their raw buffer, with the
+        dtype and shape in the header. Any other data is sent as JSON.
+
+    Args:
+        data: NumPy array or JSON serializable object
+    Returns:
+        frames: <list> the header (bytes) and the payload
+    """
+
+    if isinstance(data, (np.ndarray, np.generic)):
+        data = np.asarray(data)
+        if not data.flags.c_contiguous:
+            data = np.ascontiguousarray(data)
+        header = {'dtype': data.dtype.str, 'shape': data.shape}
+        payload = data
+    else:
+        header = {}
+        payload = json.dumps(data).encode()
+
+    return [json.dumps(header).encode(), payload]
+
+
+def unpack_payload(frames):
+    """ Unpack a message published with BaseNode.publish.
+
+    Args:
+        frames: <list> the frames of the message
+    Returns:
+        node_name: <str> name of the node that published the message
+        topic: <str> the topic
+        data: the published data, arrays are read-only views of the frame
+    """
+
+    node_name, topic = bytes(frames[0]).decode().split(';', 1)
+    header = json.loads(bytes(frames[1]).decode())
+
+    if 'dtype' in header:
+        data = np.frombuffer(frames[2], dtype=header['dtype'])
+        data = data.reshape(header['shape'])
+    else:
+        data = json.loads(bytes(frames[2]).decode())
+
+    return node_name, topic, data
+
+
+class MetricError(str):
+
+    """ Result of a metric request whose metric function raised an
+        exception. It is the error message sent to the client, and tells the
+        scheduler that the job failed.
+    """
+    pass
+
+
+def json_default(obj):
+    """ Convert NumPy arrays and scalars for json.dumps (use as its default
+        argument), e.g., for the results of metric functions.
+
+    Args:
+        obj: an object that json can not serialize by itself
+    Returns:
+        the object as (nested) lists or a Python scalar
+    """
+    if isinstance(obj, (np.ndarray, np.generic)):
+        return obj.tolist()
+    raise TypeError('Object of type {} is not JSON serializable'
+                    .format(type(obj).__name__))
+
+
 def get_ip():
     """ Return the current IP address."""
 
@@ -246,9 +1391,9 @@ def get_ip():
 def get_config_options(otype):
     """ Return list of valid configuration options for nodes and dispatcher."""
     if otype is 'node':
-        return ['node_name', 'node_type', 'node_id', 'node_description', 'primary_node', 'ip', 'port_frontend', 'port_backend', 'port_publisher', 'n_responders', 'lsl_stream_name', 'primary_n_channels', 'primary_channel_names', 'primary_channel_descriptions', 'primary_sampling_rate', 'primary_buffer_size_s', 'run_publisher', 'secondary_node', 'secondary_n_channels', 'secondary_buffer_size', 'secondary_channel_names', 'secondary_channel_descriptions', 'default_channel']
+        return ['node_name', 'node_type', 'node_id', 'node_description', 'primary_node', 'ip', 'port_frontend', 'port_backend', 'port_publisher', 'n_responders', 'broker_mode', 'lsl_stream_name', 'primary_n_channels', 'primary_channel_names', 'primary_channel_descriptions', 'primary_sampling_rate', 'primary_buffer_size_s', 'primary_chunk_size', 'primary_chunk_timeout', 'run_publisher', 'publisher_queue_size', 'publisher_hwm', 'run_streamer', 'stream_interval', 'metric_cache_size', 'metric_cache_default', 'metric_coalesce', 'metric_wait_timeout', 'incremental_interval', 'metric_threads', 'schedule', 'secondary_node', 'secondary_n_channels', 'secondary_buffer_size', 'secondary_channel_names', 'secondary_channel_descriptions', 'default_channel']
     elif otype is 'dispatcher':
-        return ['node_list', 'port', 'ip', 'n_threads', 'run_pubsub_proxy', 'proxy_port_in', 'proxy_port_out']
+        return ['node_list', 'port', 'ip', 'server', 'n_threads', 'request_timeout', 'node_concurrency', 'max_streams', 'node_ttl', 'run_pubsub_proxy', 'proxy_port_in', 'proxy_port_out']
     else:
         return None
 
@@ -354,32 +1499,57 @@ def listify(config, key, sep=','):
     return [i.strip() for i in config[key].split(sep)]
 
 
+def find_start(array, last, win):
+    """ Find the first time stamp in array that is at most win seconds older
+        than last.
+
+    Args:
+        array: <array> time stamps sorted in ascending order
+        last: <float> reference time stamp
+        win: <float> time in seconds before last
+    Returns:
+        i: <int> index of the first such time stamp (len(array) if none)
+    """
+
+    n = len(array)
+    i = int(np.searchsorted(array, last - win))
+
+    # Compare in relative time to get exactly the same boundary samples as a
+    # linear search of abs(t - last) <= win would
+    while i > 0 and abs(array[i - 1] - last) <= win:
+        i -= 1
+    while i < n and abs(array[i] - last) > win:
+        i += 1
+
+    return i
+
+
 def find_range(array, win):
     """ Find indices corresponding to win[0] and win[1] inside array.
 
+        The indices are the first samples that are at most win[0] and win[1]
+        seconds older than the last sample in array, found by bisection.
+
     Args:
-        array: <list> an array of values sorted in descending order
-        win: <tuple> window ranges
+        array: <array> time stamps sorted in ascending order
+        win: <tuple> window limits in seconds before the last time stamp
     Returns:
-        i0: <int> index of the first window limit
-        i1: <int> index of the second window limit
+        i0: <int> index of the first window limit (None if not found)
+        i1: <int> index of the second window limit (None if not found)
     """
 
-    a = array[:]
-
-    i0 = None
-    i1 = None
+    n = len(array)
+    if n == 0:
+        return None, None
 
-    for idx, val in enumerate(a):
-        if i0 is None and win[0] >= val:
-            i0 = idx
-        if i1 is None and win[1] >= val:
-            i1 = idx
+    i0 = find_start(array, array[-1], win[0])
+    i1 = find_start(array, array[-1], win[1])
 
-    return i0, i1
+    return (i0 if i0 < n else None), (i1 if i1 < n else None)
 
 
-def LRU_queue_broker(url_frontend, url_backend, NBR_WORKERS, run_state):
+def LRU_queue_broker(url_frontend, url_backend, NBR_WORKERS, run_state,
+                     poll_timeout=100):
     """ Least-recently used queue broker.
 
     Args:
@@ -388,6 +1558,7 @@ def LRU_queue_broker(url_frontend, url_backend, NBR_WORKERS, run_state):
         NBR_workers: the number of workers (worker processes / threads)
         run_state: <integer> boolean "poison pill" to signal termination to the
                              process
+        poll_timeout: <int> time (in ms) between checks of run_state
 
     This function is modified from http://zguide.zeromq.org/py:lruqueue
     originally written by Guillaume Aubert (gaubert)
@@ -412,94 +1583,99 @@ def LRU_queue_broker(url_frontend, url_backend, NBR_WORKERS, run_state):
     backend = context.socket(zmq.ROUTER)
     backend.bind(url_backend)
 
-    # Queue of available workers
-    available_workers = 0
-    workers_list = []
-
-    # init poller
-    poller = zmq.Poller()
+    # Queue of available workers, the least recently used one first
+    workers = collections.deque()
 
     # Always poll for worker activity on backend
-    poller.register(backend, zmq.POLLIN)
+    poll_workers = zmq.Poller()
+    poll_workers.register(backend, zmq.POLLIN)
 
     # Poll front-end only if we have available workers
-    poller.register(frontend, zmq.POLLIN)
+    poll_both = zmq.Poller()
+    poll_both.register(backend, zmq.POLLIN)
+    poll_both.register(frontend, zmq.POLLIN)
 
     while run_state.value:
-        socks = dict(poller.poll(5000))
+        if workers:
+            socks = dict(poll_both.poll(poll_timeout))
+        else:
+            socks = dict(poll_workers.poll(poll_timeout))
 
         # Handle worker activity on backend
-        if (backend in socks and socks[backend] == zmq.POLLIN):
+        if socks.get(backend) == zmq.POLLIN:
 
-            # Queue worker address for LRU routing
-            worker_addr = backend.recv(zmq.NOBLOCK)
+            # Worker message is [worker address][empty][READY] or
+            # [worker address][empty][client envelope][empty][reply]
+            frames = backend.recv_multipart(copy=False)
 
-            assert available_workers < NBR_WORKERS
+            # add worker back to the end of the queue
+            workers.append(frames[0].bytes)
 
-            # add worker back to the list of workers
-            available_workers += 1
-            workers_list.append(worker_addr)
+            # If client reply (not just READY), forward the frames as they
+            # are to the frontend
+            if len(frames) > 3:
+                frontend.send_multipart(frames[2:], copy=False)
 
-            # Second frame is empty
-            empty = backend.recv(zmq.NOBLOCK)
-            assert empty == b""
+        if socks.get(frontend) == zmq.POLLIN:
+            # Now get next client request, route to LRU worker
+            # Client request is [envelope][empty][request]
+            frames = frontend.recv_multipart(copy=False)
 
-            # Third frame is READY or else a client reply address
-            client_addr = backend.recv(zmq.NOBLOCK)
+            worker_id = workers.popleft()
+            backend.send_multipart([worker_id, b""] + frames, copy=False)
 
-            # If client reply, send rest back to frontend
-            if client_addr != b"READY":
-
-                # Following frame is empty
-                empty = backend.recv(zmq.NOBLOCK)
-                assert empty == b""
+    # Clean up when exiting
+    frontend.close()
+    backend.close()
+    context.term()
 
-                # reply = backend.recv()
-                more = True
-                reply = []
-                while more:
-                    reply.append(backend.recv_string(zmq.NOBLOCK))
-                    more = backend.getsockopt(zmq.RCVMORE)
 
-                frontend.send(client_addr, zmq.SNDMORE)
-                frontend.send(b"", zmq.SNDMORE)
+def proxy_queue_broker(url_frontend, url_backend, NBR_WORKERS, run_state,
+                       poll_timeout=100):
+    """ Queue broker running the ZeroMQ proxy (ROUTER-DEALER) in C.
 
-                for r in reply[:-1]:
-                    frontend.send_string(r, zmq.SNDMORE)
-                frontend.send_string(str(reply[-1]))
+        Requests are passed to the workers in a round-robin fashion without
+        any per-message work in Python, which gives a higher throughput than
+        LRU_queue_broker when the requests take roughly equally long. A slow
+        request can, however, delay the requests queued behind it at the
+        same worker. The workers must use REP sockets.
 
-        # poll on frontend only if workers are available
-        if available_workers > 0:
+    Args:
+        url_backend: the dealer url used for backend (workers)
+        url_frontend: the router url used for frontend (clients)
+        NBR_workers: the number of workers (unused, kept for compatibility
+                     with LRU_queue_broker)
+        run_state: <integer> boolean "poison pill" to signal termination to the
+                             process
+        poll_timeout: <int> time (in ms) between checks of run_state
+    """
 
-            if (frontend in socks and socks[frontend] == zmq.POLLIN):
-                # Now get next client request, route to LRU worker
-                # Client request is [address][empty][request]
+    context = zmq.Context()
 
-                client_addr = frontend.recv(zmq.NOBLOCK)
+    frontend = context.socket(zmq.ROUTER)
+    frontend.bind(url_frontend)
 
-                empty = frontend.recv(zmq.NOBLOCK)
-                assert empty == b""
+    backend = context.socket(zmq.DEALER)
+    backend.bind(url_backend)
 
-                more = True
-                request = []
-                while more:
-                    request.append(frontend.recv_string(zmq.NOBLOCK))
-                    more = frontend.getsockopt(zmq.RCVMORE)
+    # The proxy runs in its own thread and is stopped through a control socket
+    url_control = 'inproc://broker-control'
+    control_in = context.socket(zmq.PAIR)
+    control_in.bind(url_control)
+    control_out = context.socket(zmq.PAIR)
+    control_out.connect(url_control)
 
-                # Dequeue and drop the next worker address
-                available_workers -= 1
-                worker_id = workers_list.pop()
+    proxy = threading.Thread(target=zmq.proxy_steerable,
+                             args=(frontend, backend, None, control_in))
+    proxy.start()
 
-                backend.send(worker_id, zmq.SNDMORE, zmq.NOBLOCK)
-                backend.send(b"", zmq.SNDMORE, zmq.NOBLOCK)
-                backend.send(client_addr, zmq.SNDMORE, zmq.NOBLOCK)
-                backend.send(b"", zmq.SNDMORE, zmq.NOBLOCK)
+    while run_state.value:
+        time.sleep(poll_timeout / 1000.0)
 
-                for r in request[:-1]:
-                    backend.send_string(r, zmq.SNDMORE, zmq.NOBLOCK)
-                backend.send_string(str(request[-1]), zmq.NOBLOCK)
+    control_out.send(b"TERMINATE")
+    proxy.join()
 
     # Clean up when exiting
-    frontend.close()
-    backend.close()
+    for sock in [frontend, backend, control_in, control_out]:
+        sock.close()
     context.term()
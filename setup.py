@@ -10,10 +10,13 @@ setup(name='midas',
       packages=['midas'],
       package_dir={'midas': 'midas'},
       include_package_data=False,
+      python_requires='>=3.8',
       install_requires = ['bottle>=0.12',
                           'PyZMQ>=14.3.1',
                           'Waitress>=0.8.9',
-                          'pylsl>=1.10.4'],
+                          'pylsl>=1.12.2',
+                          'numpy>=1.9'],
+      extras_require={'asyncio': ['aiohttp>=3.8']},
       entry_points={"console_scripts":
                     ["midas-dispatcher = midas.dispatcher:run_from_cli"]}
 )
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+
+# Compares the bisection in utilities.find_start and find_range with the
+# linear search of the original find_range.
+
+import numpy as np
+import pytest
+from midas import utilities as mu
+
+
+def linear_find_range(array, win):
+    """ The original find_range, searching the time stamps relative to the
+        last one (in descending order) linearly.
+    """
+    a = [abs(t - array[-1]) for t in array] if len(array) else []
+
+    i0 = None
+    i1 = None
+
+    for idx, val in enumerate(a):
+        if i0 is None and win[0] >= val:
+            i0 = idx
+        if i1 is None and win[1] >= val:
+            i1 = idx
+
+    return i0, i1
+
+
+def linear_find_start(array, last, win):
+    """ Index of the first time stamp at most win seconds older than last. """
+    for idx, t in enumerate(array):
+        if abs(t - last) <= win:
+            return idx
+    return len(array)
+
+
+@pytest.fixture
+def times():
+    # irregular sampling with a few duplicate time stamps
+    rng = np.random.default_rng(0)
+    times = np.cumsum(rng.uniform(0.001, 0.02, 500)) + 1e9
+    times[100] = times[99]
+    times[300:303] = times[300]
+    return times
+
+
+WINDOWS = [(0.0, 0.0), (0.5, 0.1), (1.0, 0.0), (2.0, 1.5), (0.05, 0.04),
+           (1e6, 0.5), (1e6, 1e6), (-1.0, -2.0), (0.5, -1.0), (1e6, -1.0)]
+
+
+@pytest.mark.parametrize('win', WINDOWS)
+def test_find_range_matches_linear(times, win):
+    assert mu.find_range(times, win) == linear_find_range(times, win)
+
+
+def test_find_range_matches_linear_on_sample_boundaries(times):
+    # windows ending exactly on the time stamps of samples
+    for i in [0, 1, 99, 100, 250, 300, 301, 498, 499]:
+        win = (times[-1] - times[i], times[-1] - times[min(i + 5, 499)])
+        assert mu.find_range(times, win) == linear_find_range(times, win)
+
+
+def test_find_range_empty():
+    assert mu.find_range(np.array([]), (1.0, 0.0)) == (None, None)
+    assert mu.find_range(np.array([]), (1.0, 0.0)) == \
+        linear_find_range(np.array([]), (1.0, 0.0))
+
+
+def test_find_range_single_sample():
+    times = np.array([5.0])
+    for win in [(0.0, 0.0), (1.0, 0.0), (-1.0, -1.0)]:
+        assert mu.find_range(times, win) == linear_find_range(times, win)
+
+
+@pytest.mark.parametrize('last_offset', [-10.0, 0.0, 0.25, 10.0])
+@pytest.mark.parametrize('win', [0.0, 0.1, 0.5, 3.0, 20.0])
+def test_find_start_matches_linear(times, last_offset, win):
+    # reference time stamps before, inside and after the time stamps
+    last = times[250] + last_offset
+    assert mu.find_start(times, last, win) == \
+        linear_find_start(times, last, win)
+
+
+def test_find_start_empty():
+    assert mu.find_start(np.array([]), 1.0, 1.0) == 0
+
+
+@pytest.mark.parametrize('n_written', [5, 10, 17, 20, 33])
+@pytest.mark.parametrize('span', [None, 0.0, 0.35, 0.5, 0.95, 5.0])
+def test_ring_buffer_span_matches_linear(n_written, span):
+    # the buffer wraps around after 10 samples, so the time stamps are
+    # searched in two segments
+    buf = mu.RingBuffer(1, 10)
+    try:
+        values = np.arange(n_written, dtype=float)
+        times = values * 0.1
+        buf.write(values.reshape(-1, 1), times)
+
+        data, got = buf.read(span=span)
+
+        values, times = values[-10:], times[-10:]
+        if span is not None:
+            start = linear_find_start(times, times[-1], span)
+            values, times = values[start:], times[start:]
+        np.testing.assert_array_equal(got, times)
+        np.testing.assert_array_equal(data[0], values)
+    finally:
+        buf.unlink()
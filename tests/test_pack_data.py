@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+
+# Round trips through utilities.pack_data / unpack_data and
+# pack_payload / unpack_payload.
+
+import numpy as np
+import pytest
+from midas import utilities as mu
+
+
+def test_pack_data_round_trip():
+    results = [{'channels': ['Ch1', 'Ch2'],
+                'return': {'Ch1': {'data': np.arange(5, dtype=np.float64),
+                                   'time': np.linspace(0, 1, 5)},
+                           'Ch2': {'data': np.arange(3, dtype=np.int16),
+                                   'time': [0.0, 0.5, 1.0]}}},
+               {'channels': ['Ch3'],
+                'return': {'Ch3': {'data': np.array([]),
+                                   'time': np.array([])}}},
+               {'channels': ['Ch4'], 'return': 'Channel not found'}]
+
+    frames = mu.pack_data(results)
+    for message in [frames, b''.join(frames)]:
+        unpacked = mu.unpack_data(message)
+
+        assert len(unpacked) == 3
+        for ch, values in results[0]['return'].items():
+            got = unpacked[0]['return'][ch]
+            np.testing.assert_array_equal(got['data'], values['data'])
+            np.testing.assert_array_equal(got['time'], values['time'])
+            assert got['data'].dtype == np.asarray(values['data']).dtype
+            assert got['time'].dtype == np.float64
+        assert len(unpacked[1]['return']['Ch3']['data']) == 0
+        assert unpacked[2] == results[2]
+
+
+def test_pack_data_does_not_modify_results():
+    results = [{'return': {'Ch1': {'data': np.ones(2), 'time': np.ones(2)}}}]
+    mu.pack_data(results)
+    assert isinstance(results[0]['return']['Ch1']['data'], np.ndarray)
+
+
+def test_pack_data_error():
+    assert mu.unpack_data(mu.pack_data({'error': 'bad request'})) == \
+        {'error': 'bad request'}
+
+
+@pytest.mark.parametrize('data', [np.arange(12.0).reshape(3, 4),
+                                  np.arange(12.0).reshape(3, 4).T,
+                                  np.arange(5, dtype=np.uint8),
+                                  np.float32(2.5)])
+def test_payload_round_trip_array(data):
+    frames = [b'node;data/Ch1'] + mu.pack_payload(data)
+    node_name, topic, got = mu.unpack_payload(frames)
+
+    assert (node_name, topic) == ('node', 'data/Ch1')
+    np.testing.assert_array_equal(got, data)
+    assert got.dtype == np.asarray(data).dtype
+    assert got.shape == np.shape(data)
+
+
+@pytest.mark.parametrize('data', [{'value': 1.5, 'ok': True}, [1, 2, 3],
+                                  'text', None])
+def test_payload_round_trip_json(data):
+    frames = [b'node;results'] + mu.pack_payload(data)
+    assert mu.unpack_payload(frames) == ('node', 'results', data)
+
+
+def test_payload_topic_with_separator():
+    frames = [b'node;a;b'] + mu.pack_payload(1)
+    assert mu.unpack_payload(frames) == ('node', 'a;b', 1)
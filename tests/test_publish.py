@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+
+# Tests of BaseNode.publish and the frames sent by BaseNode.publisher.
+
+import time
+import multiprocessing as mp
+import pytest
+import zmq
+from midas.node import BaseNode
+from midas import utilities as mu
+
+PORT_PUBLISHER = 7350
+
+
+def test_publish_without_publisher():
+    node = BaseNode(node_name='no_publisher', primary_node=False)
+    with pytest.raises(RuntimeError):
+        node.publish('topic', 1)
+
+
+def test_subscription_prefixes():
+    node = BaseNode(node_name='pub',
+                    primary_node=False,
+                    ip='127.0.0.1',
+                    port_publisher=PORT_PUBLISHER,
+                    run_publisher=True)
+    node.run_state.value = 1
+    proc = mp.Process(target=node.publisher)
+    proc.start()
+
+    context = zmq.Context()
+    subscribers = {}
+    for prefix in [b'pub', b'pub;', b'pub;results']:
+        socket = context.socket(zmq.SUB)
+        socket.setsockopt(zmq.SUBSCRIBE, prefix)
+        socket.connect(node.url_publisher)
+        subscribers[prefix] = socket
+    time.sleep(0.5)
+
+    try:
+        node.publish('results', {'value': 1})
+        node.publish('other', 2)
+        node.message_queue.put('legacy')
+
+        received = {}
+        for prefix, socket in subscribers.items():
+            received[prefix] = []
+            while socket.poll(500):
+                received[prefix].append(socket.recv_multipart())
+    finally:
+        node.run_state.value = 0
+        proc.join()
+        for socket in subscribers.values():
+            socket.close()
+        context.term()
+
+    assert [mu.unpack_payload(frames)[1:]
+            for frames in received[b'pub;results']] == [('results',
+                                                          {'value': 1})]
+    assert [mu.unpack_payload(frames)[1:]
+            for frames in received[b'pub;']] == [('results', {'value': 1}),
+                                                 ('other', 2)]
+    assert len(received[b'pub']) == 3
+    assert received[b'pub'][-1] == [b'pub', b'legacy']
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+
+# Checks that the publisher-subscriber proxy of the dispatcher does not lose
+# messages while nodes join. Publishers (standing in for the publishers of
+# nodes) send numbered messages at a fixed rate and are added to the proxy
+# one at a time while the others keep publishing. A subscriber connected to
+# the proxy checks that the messages of every publisher arrive without gaps
+# from the first message it receives from that publisher.
+#
+# Run with: python -m pytest tests/test_pubsub_relay.py
+
+import time
+import threading
+import zmq
+from midas.dispatcher import Dispatcher
+
+PORT_PROXY = 7300
+PORT_PUBLISHER = 7310
+
+
+def publisher(context, name, url, rate, run_state):
+    """ Publish numbered messages at the given rate. """
+    socket = context.socket(zmq.PUB)
+    socket.bind(url)
+    n = 0
+    t_next = time.time()
+    while run_state.is_set():
+        socket.send_multipart([name.encode(), str(n).encode()])
+        n += 1
+        t_next += 1 / rate
+        time.sleep(max(0, t_next - time.time()))
+    socket.close()
+
+
+def subscriber(context, url, received, run_state):
+    """ Record the message numbers of each publisher. """
+    socket = context.socket(zmq.SUB)
+    socket.setsockopt(zmq.SUBSCRIBE, b'')
+    socket.connect(url)
+    while run_state.is_set():
+        if socket.poll(100):
+            name, n = socket.recv_multipart()
+            received.setdefault(name.decode(), []).append(int(n))
+    socket.close()
+
+
+def test_no_messages_lost_while_publishers_join(n_publishers=3, rate=500,
+                                                join_interval=0.3):
+    dispatcher = Dispatcher(ip='127.0.0.1',
+                            run_pubsub_proxy=True,
+                            proxy_port_out=PORT_PROXY)
+    proxy = threading.Thread(target=dispatcher.pubsub_proxy)
+    proxy.start()
+
+    context = zmq.Context()
+    publishers_running = threading.Event()
+    publishers_running.set()
+    subscriber_running = threading.Event()
+    subscriber_running.set()
+
+    received = {}
+    sub = threading.Thread(target=subscriber,
+                           args=(context, dispatcher.url_proxy_out,
+                                 received, subscriber_running))
+    sub.start()
+
+    # start the publishers and add them to the proxy one at a time, as the
+    # dispatcher does when it discovers new nodes
+    threads = []
+    try:
+        for i in range(n_publishers):
+            name = 'node_{}'.format(i)
+            url = 'tcp://127.0.0.1:{}'.format(PORT_PUBLISHER + i)
+            threads.append(threading.Thread(target=publisher,
+                                            args=(context, name, url, rate,
+                                                  publishers_running)))
+            threads[-1].start()
+            dispatcher.node_publisher_urls[name] = url
+            dispatcher.update_publishers()
+            time.sleep(join_interval)
+    finally:
+        publishers_running.clear()
+        for t in threads:
+            t.join()
+        time.sleep(0.5)
+        subscriber_running.clear()
+        sub.join()
+
+        dispatcher.node_publisher_urls = {}
+        dispatcher.update_publishers()
+        socket_control = dispatcher.context.socket(zmq.PUSH)
+        socket_control.connect(dispatcher.url_proxy_control)
+        socket_control.send_multipart([b'stop', b''])
+        socket_control.close()
+        proxy.join()
+        context.term()
+
+    assert sorted(received) == ['node_{}'.format(i)
+                                for i in range(n_publishers)]
+    for name, numbers in received.items():
+        # every message after the first one received, in order
+        assert numbers == list(range(numbers[0], numbers[-1] + 1)), name
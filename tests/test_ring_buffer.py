@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+
+# Tests of utilities.RingBuffer around the point where the buffer wraps.
+
+import numpy as np
+import pytest
+from midas import utilities as mu
+
+
+@pytest.fixture
+def buf():
+    buf = mu.RingBuffer(2, 8)
+    yield buf
+    buf.unlink()
+
+
+def samples(start, stop):
+    """ Samples start...stop - 1 of two channels and their time stamps. """
+    t = np.arange(start, stop, dtype=float)
+    return np.column_stack([t, -t]), t + 1000
+
+
+def expected(start, stop):
+    values, times = samples(start, stop)
+    return values.T, times
+
+
+def assert_read(result, start, stop):
+    data, times = result
+    values, t = expected(start, stop)
+    np.testing.assert_array_equal(data, values)
+    np.testing.assert_array_equal(times, t)
+
+
+def test_empty(buf):
+    data, times = buf.read()
+    assert data.shape == (2, 0)
+    assert len(times) == 0
+    assert buf.last_time == 0.0
+
+
+@pytest.mark.parametrize('n', [1, 7, 8, 9, 15, 16, 21])
+def test_push_across_wrap(buf, n):
+    values, times = samples(0, n)
+    for v, t in zip(values, times):
+        buf.push(v, t)
+
+    assert buf.count == n
+    assert buf.sequence == 2 * n
+    assert buf.full == (n >= 8)
+    assert buf.last_time == times[-1]
+    assert_read(buf.read(), max(0, n - 8), n)
+
+
+@pytest.mark.parametrize('blocks', [[5, 5], [7, 1, 1], [3, 8], [6, 20],
+                                    [8, 8, 8], [1, 7, 3, 6]])
+def test_write_across_wrap(buf, blocks):
+    n = 0
+    for k in blocks:
+        buf.write(*samples(n, n + k))
+        n += k
+
+    assert buf.count == n
+    assert_read(buf.read(), max(0, n - 8), n)
+
+
+def test_push_and_write_agree(buf):
+    other = mu.RingBuffer(2, 8)
+    try:
+        values, times = samples(0, 13)
+        for v, t in zip(values, times):
+            buf.push(v, t)
+        other.write(values[:6], times[:6])
+        other.write(values[6:], times[6:])
+
+        np.testing.assert_array_equal(buf.buffer, other.buffer)
+        assert buf.count == other.count
+    finally:
+        other.unlink()
+
+
+def test_read_rows(buf):
+    buf.write(*samples(0, 11))
+    data, times = buf.read(rows=[1])
+    values, t = expected(3, 11)
+    np.testing.assert_array_equal(data, values[[1]])
+    np.testing.assert_array_equal(times, t)
+
+
+def test_read_since_across_wrap(buf):
+    count = 0
+    n = 0
+    for k in [3, 4, 2, 6, 1, 8]:
+        buf.write(*samples(n, n + k))
+        n += k
+
+        since = count
+        count, data, times = buf.read_since(since)
+        assert count == n
+        assert_read((data, times), since, n)
+
+
+def test_read_since_after_overrun(buf):
+    # only the latest buffer_size samples are left of the samples written
+    # since the previous read
+    buf.write(*samples(0, 3))
+    count, _, _ = buf.read_since(0)
+    buf.write(*samples(3, 15))
+
+    count, data, times = buf.read_since(count)
+    assert count == 15
+    assert_read((data, times), 7, 15)
+
+
+def test_read_since_nothing_new(buf):
+    buf.write(*samples(0, 10))
+    count, data, times = buf.read_since(10)
+    assert count == 10
+    assert data.shape == (2, 0)
+    assert len(times) == 0
+
+
+@pytest.mark.parametrize('values, t', [([1.0], 0.0), ([1.0, 2.0, 3.0], 0.0),
+                                       (['a', 'b'], 0.0)])
+def test_bad_push_leaves_buffer_unchanged(buf, values, t):
+    buf.write(*samples(0, 10))
+    with pytest.raises(ValueError):
+        buf.push(values, t)
+
+    assert buf.count == 10
+    assert buf.sequence % 2 == 0
+    assert_read(buf.read(), 2, 10)
+
+
+def test_bad_write_leaves_buffer_unchanged(buf):
+    buf.write(*samples(0, 10))
+    values, times = samples(10, 14)
+    with pytest.raises(ValueError):
+        buf.write(values, times[:-1])
+    with pytest.raises(ValueError):
+        buf.write(values.T, times)
+
+    assert buf.count == 10
+    assert buf.sequence % 2 == 0
+    assert_read(buf.read(), 2, 10)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+
+# Tests of utilities.SingleFlight, the table of metric requests in flight.
+
+import time
+import threading
+import numpy as np
+import pytest
+from midas import utilities as mu
+
+
+@pytest.fixture
+def flights():
+    flights = mu.SingleFlight(n_slots=2, result_size=1024, timeout=0.2)
+    yield flights
+    flights.unlink()
+
+
+def test_waiter_gets_result(flights):
+    state, ticket = flights.claim('a')
+    assert state == 'claimed'
+    state, waiting = flights.claim('a')
+    assert state == 'pending'
+
+    result = {'value': np.arange(3)}
+    threading.Timer(0.05, flights.finish, (ticket, result)).start()
+    hit, got = flights.wait(waiting)
+
+    assert hit is True
+    np.testing.assert_array_equal(got['value'], result['value'])
+    assert flights.stats() == {'claimed': 1, 'coalesced': 1,
+                               'wait_timeouts': 0, 'in_flight': 0}
+
+
+def test_released_claim(flights):
+    _, ticket = flights.claim('a')
+    _, waiting = flights.claim('a')
+    flights.release(ticket)
+
+    assert flights.wait(waiting) == (False, None)
+    assert flights.stats()['in_flight'] == 0
+
+
+def test_result_too_large(flights):
+    _, ticket = flights.claim('a')
+    _, waiting = flights.claim('a')
+    flights.finish(ticket, 'x' * 2048)
+
+    assert flights.wait(waiting) == (False, None)
+
+
+def test_different_keys_and_full_table(flights):
+    assert flights.claim('a')[0] == 'claimed'
+    assert flights.claim('b')[0] == 'claimed'
+    assert flights.claim('c') == ('busy', None)
+
+
+def test_wait_timeout(flights):
+    flights.claim('a')
+    _, waiting = flights.claim('a')
+
+    t = time.time()
+    assert flights.wait(waiting, timeout=0.05) == (False, None)
+    assert time.time() - t < 0.2
+    assert flights.stats()['wait_timeouts'] == 1
+
+
+def test_takeover_after_timeout(flights):
+    # the first claimant never finishes (e.g. its responder died)
+    _, stale = flights.claim('a')
+    _, waiting = flights.claim('a')
+    time.sleep(0.25)
+
+    # the claim is older than timeout, the next caller takes it over and
+    # the waiters of the stale claim give up
+    state, ticket = flights.claim('a')
+    assert state == 'claimed'
+    assert ticket[0] == stale[0] and ticket[1] == stale[1] + 1
+    assert flights.wait(waiting, timeout=0) == (False, None)
+
+    # the stale claimant can not overwrite the new claim
+    _, waiting = flights.claim('a')
+    flights.finish(stale, 'stale')
+    flights.finish(ticket, 'fresh')
+    assert flights.wait(waiting) == (True, 'fresh')
+
+
+def test_abandoned_slot_is_reused(flights):
+    # slots whose claimant and waiters have gone away are freed after
+    # twice the timeout
+    flights.claim('a')
+    flights.claim('b')
+    assert flights.claim('c')[0] == 'busy'
+    time.sleep(0.45)
+    assert flights.claim('c')[0] == 'claimed'